@@ -2,22 +2,131 @@ import streamlit as st
 import sqlite3
 import os
 import hashlib
+import hmac
+import secrets
 import time
+import threading
+import queue
+import atexit
+import re
+import math
+import json
+import logging
+import functools
 import warnings
+import tempfile
 from datetime import datetime
-from typing import List, Optional
-from PIL import Image
+from typing import List, Optional, Tuple
+from PIL import Image, ImageOps, ImageSequence
 import extra_streamlit_components as stx
 from datetime import datetime, timedelta
 import base64
 import requests
+from collections import OrderedDict, Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# --- HELPERS: IN-PROCESS CACHES & IMAGE TO BASE64 ---
+IMAGE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+class ImageCache:
+    """Size-bounded (bytes) LRU of base64-encoded files, keyed by path.
+
+    Each entry remembers the file's mtime, so a rewritten file is a miss and
+    gets re-encoded; nothing has to invalidate it explicitly.
+    """
+
+    def __init__(self, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # path -> (mtime_ns, encoded)
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, path: str) -> str:
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == mtime:
+                self._entries.move_to_end(path)
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+        started = time.perf_counter()
+        with open(path, "rb") as img_file:
+            encoded = base64.b64encode(img_file.read()).decode('utf-8')
+        get_metrics().record_image(started)
+        with self._lock:
+            self._put(path, mtime, encoded)
+        return encoded
+
+    def _put(self, path: str, mtime: int, encoded: str):
+        old = self._entries.pop(path, None)
+        if old: self._bytes -= len(old[1])
+        if len(encoded) > self.max_bytes: return
+        self._entries[path] = (mtime, encoded)
+        self._bytes += len(encoded)
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire `ttl` seconds after being set."""
+
+    def __init__(self, ttl: float, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._stats["hits"] += 1
+                return entry[1]
+            if entry: del self._entries[key]
+            self._stats["misses"] += 1
+            return default
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, pred):
+        """Drops every entry for which `pred(key, value)` is true."""
+        with self._lock:
+            for key in [k for k, (_, v) in self._entries.items() if pred(k, v)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+@st.cache_resource
+def get_image_cache() -> ImageCache:
+    return ImageCache()
 
-# --- HELPER: IMAGE TO BASE64 ---
 def get_image_base64(path):
     """Converts an image file to a base64 string for HTML rendering"""
     try:
-        with open(path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode('utf-8')
+        return get_image_cache().get(path)
     except:
         return None
 
@@ -35,18 +144,457 @@ UPLOAD_DIR = "uploads"
 PROFILE_PIC_DIR = os.path.join(UPLOAD_DIR, "profiles")
 POST_IMAGE_DIR = os.path.join(UPLOAD_DIR, "posts")
 SUI_RPC_URL = "https://fullnode.mainnet.sui.io:443"
+BALANCE_TTL = 30  # seconds a fetched wallet balance is served from cache
+BALANCE_RPC_BATCH = 50  # addresses per JSON-RPC batch request
+BALANCE_WORKERS = 8  # batch requests in flight at once
+MARKET_DATA_URL = "https://api.binance.com/api/v3/ticker/24hr?symbol=SUIUSDT"
+PRICE_REFRESH_SECONDS = 30
+FALLBACK_PRICE = (1.56, 2.22)  # (price, 24h change %) until the first fetch succeeds
+# Wallets are derived ahead of time so signup just claims one
+WALLET_POOL_SIZE = 16
+WALLET_POOL_WORKERS = 2
+
+# Resized variants live under ./static so Streamlit serves them directly
+# (server.enableStaticServing in .streamlit/config.toml) instead of inlining base64.
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MEDIA_DIR = os.path.join(APP_DIR, "static", "media")
+MEDIA_URL = "app/static/media"
+IMAGE_VARIANTS = {"avatar": 64, "avatar_lg": 160, "feed": 720}
+DEFAULT_AVATAR = "https://cdn-icons-png.flaticon.com/512/149/149071.png"
+
+# Uploads are streamed to a temp file, checked by Pillow and re-encoded without metadata
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024  # keep in step with server.maxUploadSize
+UPLOAD_CHUNK = 256 * 1024
+UPLOAD_MAX_DIMENSION = 2048  # longest side of the stored original
+UPLOAD_MAX_PIXELS = 40_000_000  # larger images are rejected before decoding
+UPLOAD_MAX_ANIMATION_PIXELS = 50_000_000  # width * height * frames, also checked before decoding
+UPLOAD_FORMATS = {"PNG": ".png", "JPEG": ".jpg", "GIF": ".gif", "WEBP": ".webp"}
 
 os.makedirs(PROFILE_PIC_DIR, exist_ok=True)
 os.makedirs(POST_IMAGE_DIR, exist_ok=True)
+os.makedirs(MEDIA_DIR, exist_ok=True)
+
+# Applied once to every new connection (not on every get_conn() call)
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -16000),  # negative = KiB, i.e. ~16MB page cache
+    ("busy_timeout", 5000),
+)
+MAX_IDLE_CONNECTIONS = 8
+
+# Group commit: the writer thread waits this long after the first queued
+# write to gather more, then commits them all in one transaction.
+WRITE_BATCH_WINDOW = 0.005
+WRITE_BATCH_MAX = 256
+WRITE_BUSY_RETRIES = 5
+
+# Authors with at least this many followers aren't fanned out on write;
+# their posts are merged into readers' feeds at read time instead.
+TIMELINE_FANOUT_LIMIT = 10_000
+TIMELINE_BACKFILL = 200  # recent posts copied into a timeline on follow
+PAGE_SIZE = 20
+# User rows are cached until edited; the TTL is only a safety net
+USER_CACHE_TTL = 300
+# Columns kept in the user cache / session: no secrets, and no trigger-maintained
+# counters (those change without going through update_user_details)
+USER_COLUMNS = "id, username, display_name, bio, profile_pic_path, created_at, wallet_address"
+
+# scrypt cost (n is CPU/memory cost: 128 * n * r bytes, 16 MiB at the default);
+# hashes stored with other parameters are upgraded on the next successful login
+PASSWORD_SCRYPT_N = int(os.environ.get("APP_SCRYPT_N", 2 ** 14))
+PASSWORD_SCRYPT_R = 8
+PASSWORD_SCRYPT_P = 1
+PASSWORD_WORKERS = 4  # concurrent hash computations
+LOGIN_MAX_FAILURES = 5  # per username within LOGIN_LOCKOUT_WINDOW seconds
+LOGIN_LOCKOUT_WINDOW = 300
+LOGIN_LIMITER_MAX_USERS = 10_000  # usernames tracked at once; the least recently failed are dropped first
+
+# Login sessions: the cookie holds "<session id>.<HMAC>", the sessions table the rest
+SESSION_COOKIE = "session"
+LEGACY_COOKIE = "current_user_id"  # unsigned id cookie from before sessions; no longer honored
+SESSION_DAYS = 7
+SESSION_CACHE_TTL = 60
+SESSION_SECRET_PATH = ".session_secret"  # used when APP_SESSION_SECRET isn't set
+COOKIE_WRITE_ATTEMPTS = 3  # reruns a session cookie write is re-issued for until the browser reports it
+
+# Profile headers are cached briefly per (profile, viewer) and dropped on edits/follows/posts
+PROFILE_TTL = 15
+PROFILE_TABS = ("POSTS", "REPLIES", "LIKES")
+
+TREND_HALF_LIFE = 6 * 3600  # a hashtag use counts half as much after this many seconds
+TREND_WINDOW = 24 * 3600    # tags unused for longer than this drop off the trending panel
+NOTIFY_FLUSH_SECONDS = 0.2  # how long the notification worker gathers events into one batch
+NOTIFY_BATCH_MAX = 500
+NOTIFICATION_RETENTION_DAYS = 30  # seen notifications older than this are compacted away
+NOTIFY_COMPACT_SECONDS = 3600
+
+# Profiling: APP_DEBUG=1 adds a debug panel to the sidebar, APP_METRICS_LOG=1
+# logs one JSON line per rerun on the "app.metrics" logger
+DEBUG_PANEL = os.environ.get("APP_DEBUG") == "1"
+METRICS_LOG = os.environ.get("APP_METRICS_LOG") == "1"
+SLOW_QUERY_MS = 50  # statements slower than this are logged with their EXPLAIN QUERY PLAN
+SLOW_QUERY_LOG_SIZE = 50
+N_PLUS_ONE_THRESHOLD = 10  # the same statement this many times in one rerun is flagged
 
 # -----------------------
-# DATABASE HELPERS
+# INSTRUMENTATION
 # -----------------------
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+sql_log = logging.getLogger("app.sql")
+metrics_log = logging.getLogger("app.metrics")
+
+class Metrics:
+    """Process-wide profiling counters.
+
+    Queries, data-API calls and image encodes are attributed to the rerun open
+    on the current thread (begin/end around each script run); work done on
+    background threads (writer, notification worker) only counts toward totals.
+    """
+
+    def __init__(self, slow_log_size: int = SLOW_QUERY_LOG_SIZE):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.totals = {"queries": 0, "sql_ms": 0.0, "images": 0, "image_ms": 0.0, "reruns": 0}
+        self.views = {}  # view -> summed rerun stats + the last rerun
+        self.functions = {}  # data-API function -> {"calls", "ms"}
+        self.slow = deque(maxlen=slow_log_size)
+
+    def current(self) -> Optional[dict]:
+        return getattr(self._local, "rerun", None)
+
+    def begin(self, view: Optional[str]):
+        self.end(interrupted=True)  # st.rerun()/st.stop() skip the end of the script
+        self._local.rerun = {"view": view, "started": time.perf_counter(), "queries": 0, "sql_ms": 0.0,
+                             "images": 0, "image_ms": 0.0, "statements": Counter(), "calls": Counter()}
+
+    def end(self, view: Optional[str] = None, interrupted: bool = False) -> Optional[dict]:
+        rerun = self.current()
+        if rerun is None: return None
+        self._local.rerun = None
+        statements = rerun.pop("statements")
+        record = dict(rerun, view=view or rerun["view"] or "-", interrupted=interrupted,
+                      wall_ms=round((time.perf_counter() - rerun.pop("started")) * 1000, 2),
+                      sql_ms=round(rerun["sql_ms"], 2), image_ms=round(rerun["image_ms"], 2),
+                      calls=dict(rerun["calls"]),
+                      repeated={sql: n for sql, n in statements.most_common(5) if n >= N_PLUS_ONE_THRESHOLD})
+        if record["repeated"]:
+            sql_log.warning(json.dumps({"event": "repeated_statements", "view": record["view"], "repeated": record["repeated"]}))
+        with self._lock:
+            self.totals["reruns"] += 1
+            agg = self.views.setdefault(record["view"], {"reruns": 0, "queries": 0, "sql_ms": 0.0, "images": 0, "image_ms": 0.0, "wall_ms": 0.0})
+            agg["reruns"] += 1
+            for k in ("queries", "sql_ms", "images", "image_ms", "wall_ms"): agg[k] += record[k]
+            agg["last"] = record
+        if METRICS_LOG: metrics_log.info(json.dumps(dict(record, event="rerun")))
+        return record
+
+    def record_query(self, conn: sqlite3.Connection, sql: str, params, started: float):
+        ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.totals["queries"] += 1
+            self.totals["sql_ms"] += ms
+        rerun = self.current()
+        if rerun is not None:
+            rerun["queries"] += 1
+            rerun["sql_ms"] += ms
+            rerun["statements"][" ".join(sql.split())] += 1
+        if ms >= SLOW_QUERY_MS:
+            entry = {"event": "slow_query", "ms": round(ms, 2), "sql": " ".join(sql.split()),
+                     "view": rerun and rerun["view"], "at": time.time(), "plan": self._explain(conn, sql, params)}
+            with self._lock: self.slow.append(entry)
+            sql_log.warning(json.dumps(entry))
+
+    @staticmethod
+    def _explain(conn: sqlite3.Connection, sql: str, params) -> List[str]:
+        if params is None or not sql.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")): return []
+        try:  # straight through the base class so the EXPLAIN itself isn't recorded
+            return [row[3] for row in sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", params)]
+        except sqlite3.Error:
+            return []
+
+    def record_image(self, started: float):
+        ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.totals["images"] += 1
+            self.totals["image_ms"] += ms
+        rerun = self.current()
+        if rerun is not None:
+            rerun["images"] += 1
+            rerun["image_ms"] += ms
+
+    def record_call(self, name: str, started: float):
+        ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            fn = self.functions.setdefault(name, {"calls": 0, "ms": 0.0})
+            fn["calls"] += 1
+            fn["ms"] += ms
+        rerun = self.current()
+        if rerun is not None: rerun["calls"][name] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"totals": dict(self.totals), "views": {v: dict(a) for v, a in self.views.items()},
+                    "functions": {f: dict(s) for f, s in self.functions.items()}, "slow_queries": list(self.slow)}
+
+@st.cache_resource(show_spinner=False)
+def get_metrics() -> Metrics:
+    return Metrics()
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        started = time.perf_counter()
+        try: return super().execute(sql, params)
+        finally:
+            if self.connection.metrics: self.connection.metrics.record_query(self.connection, sql, params, started)
+
+    def executemany(self, sql, seq):
+        started = time.perf_counter()
+        try: return super().executemany(sql, seq)
+        finally:
+            if self.connection.metrics: self.connection.metrics.record_query(self.connection, sql, None, started)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose statements are timed into `metrics` (time to first row)."""
+    metrics: Optional[Metrics] = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+def open_connection(path: str, **kwargs) -> sqlite3.Connection:
+    """sqlite3.connect with the app's pragmas, row factory and instrumentation."""
+    conn = sqlite3.connect(path, factory=InstrumentedConnection, **kwargs)
+    conn.metrics = get_metrics()
     conn.row_factory = sqlite3.Row
+    for name, value in SQLITE_PRAGMAS:
+        sqlite3.Connection.execute(conn, f"PRAGMA {name} = {value}")
     return conn
 
+def timed(fn):
+    """Counts calls and time of a data-API function in the metrics."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try: return fn(*args, **kwargs)
+        finally: get_metrics().record_call(fn.__name__, started)
+    return wrapper
+
+def metrics_snapshot() -> dict:
+    """Structured export of everything the debug panel shows."""
+    snap = get_metrics().snapshot()
+    snap.update(pool=pool_stats(), writes=write_stats(), user_cache=user_cache_stats(),
+                images=get_image_cache().stats(), wallet_pool=wallet_pool_stats(), at=time.time())
+    return snap
+
+# -----------------------
+# DATABASE HELPERS
+# -----------------------
+class ConnectionPool:
+    """Gives each Streamlit script thread one reused SQLite connection.
+
+    Connections owned by threads that have finished are recycled into an
+    idle list on the next acquire, so reruns don't leak file descriptors.
+    """
+
+    def __init__(self, path: str, max_idle: int = MAX_IDLE_CONNECTIONS):
+        self.path = path
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._owned = {}  # thread ident -> (thread, conn)
+        self._idle = []
+        self._stats = {"opened": 0, "reused": 0, "recycled": 0, "closed": 0}
+
+    def _open(self) -> sqlite3.Connection:
+        return open_connection(self.path, check_same_thread=False)
+
+    def _retire(self, conn: sqlite3.Connection):
+        # caller holds the lock
+        if conn.in_transaction:
+            conn.rollback()
+        if len(self._idle) < self.max_idle:
+            self._idle.append(conn)
+            self._stats["recycled"] += 1
+        else:
+            conn.close()
+            self._stats["closed"] += 1
+
+    def _reap(self):
+        for ident, (thread, conn) in list(self._owned.items()):
+            if not thread.is_alive():
+                del self._owned[ident]
+                self._retire(conn)
+
+    def acquire(self) -> sqlite3.Connection:
+        thread = threading.current_thread()
+        with self._lock:
+            owned = self._owned.get(thread.ident)
+            if owned and owned[0] is thread:
+                self._stats["reused"] += 1
+                return owned[1]
+            if owned:  # ident reused by a new thread
+                del self._owned[thread.ident]
+                self._retire(owned[1])
+            self._reap()
+            if self._idle:
+                conn = self._idle.pop()
+                self._stats["reused"] += 1
+            else:
+                conn = self._open()
+                self._stats["opened"] += 1
+            self._owned[thread.ident] = (thread, conn)
+            return conn
+
+    def release(self):
+        """Hands the current thread's connection back to the idle list."""
+        with self._lock:
+            owned = self._owned.pop(threading.get_ident(), None)
+            if owned:
+                self._retire(owned[1])
+
+    def close_all(self):
+        with self._lock:
+            for _, conn in self._owned.values():
+                conn.close()
+                self._stats["closed"] += 1
+            for conn in self._idle:
+                conn.close()
+                self._stats["closed"] += 1
+            self._owned.clear()
+            self._idle.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, in_use=len(self._owned), idle=len(self._idle))
+
+@st.cache_resource(show_spinner=False)
+def get_pool() -> ConnectionPool:
+    # cache_resource keeps one pool per server process across reruns
+    pool = ConnectionPool(DB_PATH)
+    atexit.register(pool.close_all)
+    return pool
+
+def get_conn() -> sqlite3.Connection:
+    return get_pool().acquire()
+
+def pool_stats() -> dict:
+    return get_pool().stats()
+
+# --- WRITE COORDINATOR ---
+def _is_busy(e: Exception) -> bool:
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in str(e) or "busy" in str(e))
+
+class WriteCoordinator:
+    """Serializes writes through one connection and commits them in batches.
+
+    Each job is a callable taking a cursor; it runs inside its own savepoint
+    so a failing job (e.g. a duplicate like) is rolled back alone and its
+    exception is handed back to the caller, while the rest of the batch
+    still commits. Results are only released once the commit has landed.
+    """
+
+    def __init__(self, path: str, window: float = WRITE_BATCH_WINDOW, batch_max: int = WRITE_BATCH_MAX, retries: int = WRITE_BUSY_RETRIES):
+        self.window = window
+        self.batch_max = batch_max
+        self.retries = retries
+        self._conn = open_connection(path, check_same_thread=False, isolation_level=None)
+        self._queue = queue.Queue()
+        self._stats = {"jobs": 0, "batches": 0, "busy_retries": 0, "failed": 0}
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn) -> Future:
+        fut = Future()
+        self._queue.put((fn, fut))
+        return fut
+
+    def in_writer(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None: break
+            batch = [job]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.batch_max:
+                try: job = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty: break
+                if job is None:
+                    self._queue.put(None)  # finish this batch, then stop
+                    break
+                batch.append(job)
+            self._commit_batch(batch)
+
+    def _apply(self, batch: list) -> list:
+        c = self._conn.cursor()
+        outcomes = []
+        c.execute("BEGIN IMMEDIATE")
+        for fn, _ in batch:
+            c.execute("SAVEPOINT job")
+            try:
+                outcomes.append((True, fn(c)))
+                c.execute("RELEASE job")
+            except Exception as e:
+                if _is_busy(e): raise
+                c.execute("ROLLBACK TO job")
+                c.execute("RELEASE job")
+                outcomes.append((False, e))
+        c.execute("COMMIT")
+        return outcomes
+
+    def _commit_batch(self, batch: list):
+        delay = 0.01
+        for attempt in range(self.retries + 1):
+            try:
+                outcomes = self._apply(batch)
+                break
+            except Exception as e:
+                if self._conn.in_transaction: self._conn.execute("ROLLBACK")
+                if _is_busy(e) and attempt < self.retries:
+                    self._stats["busy_retries"] += 1
+                    time.sleep(delay)
+                    delay *= 2
+                    continue
+                outcomes = [(False, e)] * len(batch)
+                break
+        self._stats["jobs"] += len(batch)
+        self._stats["batches"] += 1
+        for (_, fut), (ok, value) in zip(batch, outcomes):
+            if ok: fut.set_result(value)
+            else:
+                self._stats["failed"] += 1
+                fut.set_exception(value)
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._conn.close()
+
+    def stats(self) -> dict:
+        return dict(self._stats, queued=self._queue.qsize())
+
+@st.cache_resource
+def get_writer() -> WriteCoordinator:
+    writer = WriteCoordinator(DB_PATH)
+    atexit.register(writer.stop)
+    return writer
+
+def run_write(fn):
+    """Runs `fn(cursor)` in the next group commit and returns its result (or raises its error)."""
+    writer = get_writer()
+    if writer.in_writer():  # nested call from inside a job
+        return fn(writer._conn.cursor())
+    return writer.submit(fn).result()
+
+def write_stats() -> dict:
+    return get_writer().stats()
+
 def init_db():
     conn = get_conn()
     c = conn.cursor()
@@ -72,8 +620,158 @@ def init_db():
     c.execute("""CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY, sender_id INTEGER, receiver_id INTEGER, text TEXT, created_at REAL, FOREIGN KEY(sender_id) REFERENCES users(id), FOREIGN KEY(receiver_id) REFERENCES users(id))""")
     c.execute("""CREATE TABLE IF NOT EXISTS notifications (id INTEGER PRIMARY KEY, user_id INTEGER, text TEXT, seen INTEGER DEFAULT 0, created_at REAL, FOREIGN KEY(user_id) REFERENCES users(id))""")
     conn.commit()
+    run_migrations(conn)
     return conn
 
+# -----------------------
+# SCHEMA MIGRATIONS
+# -----------------------
+# Ordered (version, description, steps). A step is either a SQL string or a
+# callable taking the connection. Never edit an applied migration - add a new one.
+MIGRATIONS = [
+    (1, "secondary indexes for hot queries", [
+        "CREATE INDEX IF NOT EXISTS idx_posts_user_created ON posts(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_posts_created ON posts(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_replies_post_created ON replies(post_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_replies_user_created ON replies(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_likes_post ON likes(post_id)",
+        "CREATE INDEX IF NOT EXISTS idx_likes_user_created ON likes(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_bookmarks_user_created ON bookmarks(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_follows_followed ON follows(followed_id, follower_id)",
+        "CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON notifications(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_pair_created ON messages(sender_id, receiver_id, created_at)",
+    ]),
+    (2, "denormalized like/reply/follow counters", [
+        "ALTER TABLE posts ADD COLUMN like_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE posts ADD COLUMN reply_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE users ADD COLUMN follower_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE users ADD COLUMN following_count INTEGER NOT NULL DEFAULT 0",
+        "CREATE TRIGGER IF NOT EXISTS trg_likes_ins AFTER INSERT ON likes BEGIN UPDATE posts SET like_count = like_count + 1 WHERE id = NEW.post_id; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_likes_del AFTER DELETE ON likes BEGIN UPDATE posts SET like_count = like_count - 1 WHERE id = OLD.post_id; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_replies_ins AFTER INSERT ON replies BEGIN UPDATE posts SET reply_count = reply_count + 1 WHERE id = NEW.post_id; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_replies_del AFTER DELETE ON replies BEGIN UPDATE posts SET reply_count = reply_count - 1 WHERE id = OLD.post_id; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_follows_ins AFTER INSERT ON follows BEGIN UPDATE users SET follower_count = follower_count + 1 WHERE id = NEW.followed_id; UPDATE users SET following_count = following_count + 1 WHERE id = NEW.follower_id; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_follows_del AFTER DELETE ON follows BEGIN UPDATE users SET follower_count = follower_count - 1 WHERE id = OLD.followed_id; UPDATE users SET following_count = following_count - 1 WHERE id = OLD.follower_id; END",
+        lambda conn: recount_counters(conn, commit=False),
+    ]),
+    (3, "materialized home timelines", [
+        "CREATE TABLE IF NOT EXISTS timeline (user_id INTEGER, created_at REAL, post_id INTEGER, author_id INTEGER, PRIMARY KEY (user_id, created_at, post_id)) WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS idx_timeline_user_author ON timeline(user_id, author_id)",
+        "INSERT OR IGNORE INTO timeline (user_id, created_at, post_id, author_id) SELECT user_id, created_at, id, user_id FROM posts",
+        "INSERT OR IGNORE INTO timeline (user_id, created_at, post_id, author_id) SELECT f.follower_id, p.created_at, p.id, p.user_id FROM follows f JOIN posts p ON p.user_id = f.followed_id",
+    ]),
+    (4, "message id range index for incremental chat sync", [
+        # the implicit rowid suffix lets (sender, receiver, id > ?) be a range seek
+        "CREATE INDEX IF NOT EXISTS idx_messages_pair ON messages(sender_id, receiver_id)",
+    ]),
+    (5, "FTS5 search indexes for posts and users", [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(text, content='posts', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS trg_posts_fts_ins AFTER INSERT ON posts BEGIN INSERT INTO posts_fts(rowid, text) VALUES (NEW.id, NEW.text); END",
+        "CREATE TRIGGER IF NOT EXISTS trg_posts_fts_del AFTER DELETE ON posts BEGIN INSERT INTO posts_fts(posts_fts, rowid, text) VALUES ('delete', OLD.id, OLD.text); END",
+        "CREATE TRIGGER IF NOT EXISTS trg_posts_fts_upd AFTER UPDATE OF text ON posts BEGIN INSERT INTO posts_fts(posts_fts, rowid, text) VALUES ('delete', OLD.id, OLD.text); INSERT INTO posts_fts(rowid, text) VALUES (NEW.id, NEW.text); END",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(username, display_name, content='users', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS trg_users_fts_ins AFTER INSERT ON users BEGIN INSERT INTO users_fts(rowid, username, display_name) VALUES (NEW.id, NEW.username, NEW.display_name); END",
+        "CREATE TRIGGER IF NOT EXISTS trg_users_fts_del AFTER DELETE ON users BEGIN INSERT INTO users_fts(users_fts, rowid, username, display_name) VALUES ('delete', OLD.id, OLD.username, OLD.display_name); END",
+        "CREATE TRIGGER IF NOT EXISTS trg_users_fts_upd AFTER UPDATE OF username, display_name ON users BEGIN INSERT INTO users_fts(users_fts, rowid, username, display_name) VALUES ('delete', OLD.id, OLD.username, OLD.display_name); INSERT INTO users_fts(rowid, username, display_name) VALUES (NEW.id, NEW.username, NEW.display_name); END",
+        lambda conn: rebuild_search_index(conn, commit=False),
+    ]),
+    (6, "hashtag/mention index and trending counters", [
+        "CREATE TABLE IF NOT EXISTS hashtags (tag TEXT NOT NULL, created_at REAL NOT NULL, post_id INTEGER NOT NULL, reply_id INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (tag, created_at, post_id, reply_id)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS mentions (user_id INTEGER NOT NULL, created_at REAL NOT NULL, post_id INTEGER NOT NULL, reply_id INTEGER NOT NULL DEFAULT 0, author_id INTEGER, PRIMARY KEY (user_id, created_at, post_id, reply_id)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS trending (tag TEXT PRIMARY KEY, log_score REAL NOT NULL, last_used REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_trending_score ON trending(log_score)",
+        lambda conn: backfill_terms(conn),
+    ]),
+    (7, "coalescable notifications", [
+        "ALTER TABLE notifications ADD COLUMN kind TEXT",
+        "ALTER TABLE notifications ADD COLUMN target_id INTEGER",
+        "ALTER TABLE notifications ADD COLUMN actor TEXT",
+        "ALTER TABLE notifications ADD COLUMN actor_count INTEGER NOT NULL DEFAULT 1",
+        # one unseen row per (recipient, kind, target); further events bump it
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_coalesce ON notifications(user_id, kind, target_id) WHERE seen = 0 AND kind IS NOT NULL",
+    ]),
+    (8, "per-user unread counter", [
+        "ALTER TABLE users ADD COLUMN notif_unread INTEGER NOT NULL DEFAULT 0",
+        "CREATE TRIGGER IF NOT EXISTS trg_notifications_ins AFTER INSERT ON notifications WHEN NEW.seen = 0 BEGIN UPDATE users SET notif_unread = notif_unread + 1 WHERE id = NEW.user_id; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_notifications_seen AFTER UPDATE OF seen ON notifications WHEN OLD.seen = 0 AND NEW.seen = 1 BEGIN UPDATE users SET notif_unread = notif_unread - 1 WHERE id = NEW.user_id; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_notifications_del AFTER DELETE ON notifications WHEN OLD.seen = 0 BEGIN UPDATE users SET notif_unread = notif_unread - 1 WHERE id = OLD.user_id; END",
+        "UPDATE users SET notif_unread = (SELECT COUNT(*) FROM notifications n WHERE n.user_id = users.id AND n.seen = 0)",
+    ]),
+    (9, "server-side login sessions", [
+        # token_hash = sha256 of the session id, so the table alone can't be replayed as cookies
+        "CREATE TABLE IF NOT EXISTS sessions (token_hash TEXT PRIMARY KEY, user_id INTEGER NOT NULL, created_at REAL, expires_at REAL) WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id)",
+    ]),
+    (10, "unseen-notification index", [
+        # mark-seen touches only a user's unseen rows, however long their history
+        "CREATE INDEX IF NOT EXISTS idx_notifications_unread ON notifications(user_id) WHERE seen = 0",
+    ]),
+    (11, "distinct actors per coalesced notification", [
+        "CREATE TABLE IF NOT EXISTS notification_actors (notification_id INTEGER NOT NULL, actor_id INTEGER NOT NULL, PRIMARY KEY (notification_id, actor_id)) WITHOUT ROWID",
+        # only unseen rows still coalesce; drop their actors once seen or deleted (ids get reused)
+        "CREATE TRIGGER IF NOT EXISTS trg_notification_actors_seen AFTER UPDATE OF seen ON notifications WHEN NEW.seen = 1 BEGIN DELETE FROM notification_actors WHERE notification_id = NEW.id; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_notification_actors_del AFTER DELETE ON notifications BEGIN DELETE FROM notification_actors WHERE notification_id = OLD.id; END",
+        # earlier events weren't attributed; keep the latest actor of each open row
+        "INSERT OR IGNORE INTO notification_actors (notification_id, actor_id) SELECT n.id, u.id FROM notifications n JOIN users u ON u.username = n.actor WHERE n.seen = 0 AND n.kind IS NOT NULL",
+    ]),
+]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()
+    return row[0]
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """Applies every migration newer than schema_version, one transaction each."""
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, description TEXT, applied_at REAL)")
+    conn.commit()
+    for version, description, steps in MIGRATIONS:
+        if version <= get_schema_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # re-check under the write lock in case another process got here first
+            if version <= get_schema_version(conn):
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step): step(conn)
+                else: conn.execute(step)
+            conn.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)", (version, description, now_ts()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return get_schema_version(conn)
+
+@st.cache_resource(show_spinner="Upgrading the database…")
+def ensure_schema() -> int:
+    """init_db() once per process rather than on every rerun; returns the schema version."""
+    conn = init_db()
+    return get_schema_version(conn)
+
+def backfill_terms(conn: sqlite3.Connection):
+    """Indexes hashtags/mentions of existing posts and replies (no notifications)."""
+    c = conn.cursor()
+    for row in conn.execute("SELECT id, user_id, text, created_at FROM posts ORDER BY created_at").fetchall():
+        index_terms(c, row["text"], row["user_id"], row["id"], row["created_at"])
+    for row in conn.execute("SELECT id, post_id, user_id, text, created_at FROM replies ORDER BY created_at").fetchall():
+        index_terms(c, row["text"], row["user_id"], row["post_id"], row["created_at"], reply_id=row["id"])
+
+def rebuild_search_index(conn: Optional[sqlite3.Connection] = None, commit: bool = True):
+    """Repair command: rebuilds both FTS indexes from the posts and users tables."""
+    conn = conn or get_conn()
+    conn.execute("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+    if commit: conn.commit()
+
+def recount_counters(conn: Optional[sqlite3.Connection] = None, commit: bool = True):
+    """Repair command: recomputes every denormalized counter from the source tables."""
+    conn = conn or get_conn()
+    conn.execute("UPDATE posts SET like_count = (SELECT COUNT(*) FROM likes WHERE likes.post_id = posts.id), reply_count = (SELECT COUNT(*) FROM replies WHERE replies.post_id = posts.id)")
+    conn.execute("UPDATE users SET follower_count = (SELECT COUNT(*) FROM follows WHERE follows.followed_id = users.id), following_count = (SELECT COUNT(*) FROM follows WHERE follows.follower_id = users.id)")
+    if commit: conn.commit()
+
 # -----------------------
 # WEB3 / CRYPTO FUNCTIONS
 # -----------------------
@@ -87,19 +785,137 @@ def generate_new_wallet():
     )
     return str(address), keypair.serialize(), mnemonic
 
-def get_sui_balance(address: str):
+class WalletPool:
+    """Keeps up to `size` freshly generated wallets ready for signup.
+
+    Worker threads refill the pool in the background; claim() falls back
+    to generating inline when it has been drained.
+    """
+
+    def __init__(self, size: int = WALLET_POOL_SIZE, workers: int = WALLET_POOL_WORKERS, generate=generate_new_wallet):
+        self.generate = generate
+        self._ready = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()  # guards _stats; workers and script threads all count
+        self._stats = {"generated": 0, "claimed": 0, "fallbacks": 0, "errors": 0}
+        self._threads = [threading.Thread(target=self._run, name=f"wallet-pool-{i}", daemon=True) for i in range(workers)]
+        for t in self._threads: t.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                wallet = self.generate()
+            except Exception:
+                self._count("errors")
+                self._stop.wait(5)
+                continue
+            self._count("generated")
+            while not self._stop.is_set():
+                try:
+                    self._ready.put(wallet, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def claim(self) -> Tuple[str, str, str]:
+        """(address, private key, mnemonic) — pre-generated if one is ready."""
+        try:
+            wallet = self._ready.get_nowait()
+        except queue.Empty:
+            self._count("fallbacks")
+            wallet = self.generate()
+        self._count("claimed")
+        return wallet
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def give_back(self, wallet: Tuple[str, str, str]):
+        """Returns a claimed wallet that never got persisted (e.g. signup failed)."""
+        try: self._ready.put_nowait(wallet)
+        except queue.Full: pass
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, depth=self._ready.qsize(), capacity=self._ready.maxsize)
+
+@st.cache_resource(show_spinner=False)
+def get_wallet_pool() -> WalletPool:
+    pool = WalletPool()
+    atexit.register(pool.stop)
+    return pool
+
+def wallet_pool_stats() -> dict:
+    return get_wallet_pool().stats()
+
+@st.cache_resource
+def get_sui_client(rpc_url: str = SUI_RPC_URL) -> SyncClient:
+    """Read-only client, built once per RPC URL and shared by all sessions."""
+    cfg = SuiConfig.user_config(prv_keys=[], rpc_url=rpc_url)
+    return SyncClient(cfg)
+
+@st.cache_resource
+def get_balance_cache() -> TTLCache:
+    return TTLCache(BALANCE_TTL)
+
+def get_sui_balance(address: str, use_cache: bool = True):
+    cache = get_balance_cache()
+    if use_cache:
+        cached = cache.get(address)
+        if cached is not None: return cached
     try:
-        cfg = SuiConfig.user_config(prv_keys=[], rpc_url=SUI_RPC_URL)
-        client = SyncClient(cfg)
-        result = client.get_gas(SuiAddress(address))
+        result = get_sui_client().get_gas(SuiAddress(address))
         if result.is_ok():
             total_mist = sum(int(obj.balance) for obj in result.result_data.data)
-            return total_mist / 1_000_000_000
+            balance = total_mist / 1_000_000_000
+            cache.set(address, balance)
+            return balance
         return 0.0
     except Exception as e:
         return 0.0
 
+def _fetch_balance_batch(session: requests.Session, rpc_url: str, addresses: List[str], timeout: float) -> dict:
+    payload = [{"jsonrpc": "2.0", "id": i, "method": "suix_getBalance", "params": [addr, "0x2::sui::SUI"]} for i, addr in enumerate(addresses)]
+    replies = session.post(rpc_url, json=payload, timeout=timeout).json()
+    if isinstance(replies, dict): replies = [replies]
+    balances = {}
+    for reply in replies:
+        if "result" in reply and isinstance(reply.get("id"), int) and reply["id"] < len(addresses):
+            balances[addresses[reply["id"]]] = int(reply["result"]["totalBalance"]) / 1_000_000_000
+    return balances
+
+def get_sui_balances(addresses: List[str], use_cache: bool = True, rpc_url: str = SUI_RPC_URL,
+                     batch_size: int = BALANCE_RPC_BATCH, workers: int = BALANCE_WORKERS, timeout: float = 10) -> dict:
+    """{address: SUI balance} for many wallets via concurrent JSON-RPC batches.
+
+    Fresh results are merged into the shared balance cache; addresses whose
+    lookup failed come back as 0.0 and aren't cached, like get_sui_balance.
+    """
+    cache = get_balance_cache()
+    balances, missing = {}, []
+    for addr in dict.fromkeys(addresses):
+        cached = cache.get(addr) if use_cache else None
+        if cached is None: missing.append(addr)
+        else: balances[addr] = cached
+    if missing:
+        session = requests.Session()
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_fetch_balance_batch, session, rpc_url, batch, timeout) for batch in batches]
+            for fut in futures:
+                try: fetched = fut.result()
+                except Exception: continue
+                for addr, balance in fetched.items():
+                    cache.set(addr, balance)
+                balances.update(fetched)
+    return {addr: balances.get(addr, 0.0) for addr in addresses}
+
 def send_sui_payment(sender_priv_key: str, recipient_addr: str, amount_sui: float):
+    # signing needs the sender's key in the config, so this client isn't pooled
     amount_mist = int(amount_sui * 1_000_000_000)
     try:
         cfg = SuiConfig.user_config(prv_keys=[sender_priv_key], rpc_url=SUI_RPC_URL)
@@ -110,29 +926,80 @@ def send_sui_payment(sender_priv_key: str, recipient_addr: str, amount_sui: floa
         result = txn.execute(gas_budget="5000000")
         if result.is_ok():
             digest = result.result_data.digest if hasattr(result.result_data, 'digest') else "Unknown Digest"
+            get_balance_cache().invalidate(str(cfg.active_address))
+            get_balance_cache().invalidate(recipient_addr)
             return True, digest
         else:
             return False, result.result_string
     except Exception as e:
         return False, str(e)
     
-def get_sui_market_data():
+class PriceFeed:
+    """Refreshes the SUI ticker on a background thread so readers never wait on it.
 
+    `url` can point at any endpoint returning Binance's 24hr ticker JSON
+    (lastPrice, priceChangePercent), e.g. a local stub server.
+    """
+
+    def __init__(self, url: str = MARKET_DATA_URL, interval: float = PRICE_REFRESH_SECONDS, timeout: float = 5):
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._latest = None  # (price, change_pct, fetched_at)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "PriceFeed":
+        with self._lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="sui-price-feed", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self) -> bool:
         try:
-            url = "https://api.binance.com/api/v3/ticker/24hr?symbol=SUIUSDT"
-            response = requests.get(url, timeout=5)
-            data = response.json()
-            return float(data['lastPrice']), float(data['priceChangePercent'])
-        except:
-            # Final Fallback if everything fails
-            return 1.56, 2.22
+            resp = self.session.get(self.url, timeout=self.timeout)
+            resp.raise_for_status()
+            data = resp.json()
+            quote = (float(data['lastPrice']), float(data['priceChangePercent']), time.time())
+        except Exception:
+            return False  # keep serving the last known price
+        with self._lock:
+            self._latest = quote
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def latest(self) -> Tuple[float, float, Optional[float]]:
+        """(price, 24h change %, age in seconds); age is None while only the fallback is known."""
+        with self._lock:
+            quote = self._latest
+        if quote is None:
+            return (*FALLBACK_PRICE, None)
+        return quote[0], quote[1], time.time() - quote[2]
+
+@st.cache_resource
+def get_price_feed() -> PriceFeed:
+    feed = PriceFeed().start()
+    atexit.register(feed.stop)
+    return feed
+
+def get_sui_market_data():
+    price, change_pct, _ = get_price_feed().latest()
+    return price, change_pct
 
 # -----------------------
 # UTILITY
 # -----------------------
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
-
 def now_ts() -> float:
     return time.time()
 
@@ -140,171 +1007,588 @@ def human_time(ts: float) -> str:
     dt = datetime.fromtimestamp(ts)
     return dt.strftime("%Y-%m-%d %H:%M")
 
+# -----------------------
+# CREDENTIALS
+# -----------------------
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + (1 << 20), dklen=32)
+
+def hash_password(password: str, n: Optional[int] = None, r: int = PASSWORD_SCRYPT_R, p: int = PASSWORD_SCRYPT_P) -> str:
+    """Salted scrypt, stored as scrypt$n$r$p$salt$hash (base64)."""
+    n = n or PASSWORD_SCRYPT_N
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, n, r, p)
+    return f"scrypt${n}${r}${p}${base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}"
+
+def verify_password(password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+    """(matches, needs_rehash). Legacy unsalted SHA-256 hashes still verify but ask for a rehash."""
+    if not stored: return False, False
+    if not stored.startswith("scrypt$"):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+        ok = hmac.compare_digest(_scrypt(password, base64.b64decode(salt), n, r, p), base64.b64decode(digest))
+    except (ValueError, TypeError):
+        return False, False
+    return ok, ok and (n, r, p) != (PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+
+@st.cache_resource
+def get_password_pool() -> ThreadPoolExecutor:
+    # hashlib.scrypt releases the GIL, so threads give real parallelism here
+    return ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="kdf")
+
+def run_kdf(fn, *args):
+    """Runs a hashing call on the bounded KDF pool so at most PASSWORD_WORKERS run at once."""
+    return get_password_pool().submit(fn, *args).result()
+
+@st.cache_resource
+def _dummy_hash() -> str:
+    return hash_password(secrets.token_hex(8))
+
+class LoginLimiter:
+    """Allows `max_failures` failed logins per username within `window` seconds."""
+
+    def __init__(self, max_failures: int = LOGIN_MAX_FAILURES, window: float = LOGIN_LOCKOUT_WINDOW,
+                 max_users: int = LOGIN_LIMITER_MAX_USERS):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._failures = OrderedDict()  # username -> last max_failures failure times, least recently failed first
+
+    def retry_after(self, username: str) -> float:
+        """Seconds until `username` may try again; 0 when not locked out."""
+        now = time.monotonic()
+        with self._lock:
+            recent = self._failures.get(username)
+            if not recent: return 0.0
+            while recent and recent[0] <= now - self.window: recent.popleft()
+            if not recent: del self._failures[username]
+            if len(recent) < self.max_failures: return 0.0
+            return recent[0] + self.window - now
+
+    def failed(self, username: str):
+        now = time.monotonic()
+        with self._lock:
+            recent = self._failures.pop(username, None) or deque(maxlen=self.max_failures)
+            recent.append(now)
+            self._failures[username] = recent
+            # the front's latest failure is the oldest of all; drop it once expired, or when full
+            while self._failures:
+                oldest = next(iter(self._failures.values()))
+                if oldest[-1] > now - self.window and len(self._failures) <= self.max_users: break
+                self._failures.popitem(last=False)
+
+    def succeeded(self, username: str):
+        with self._lock:
+            self._failures.pop(username, None)
+
+@st.cache_resource
+def get_login_limiter() -> LoginLimiter:
+    return LoginLimiter()
+
+def login_retry_after(username: str) -> float:
+    return get_login_limiter().retry_after(username)
+
+# -----------------------
+# MEDIA PIPELINE
+# -----------------------
+class UploadError(ValueError):
+    """An upload that was rejected; the message is safe to show to the user."""
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK), b""): h.update(chunk)
+    return h.hexdigest()
+
+def _save_animation(img: Image.Image, dest: str, fmt: str, max_side: int):
+    """Writes every frame of `img` to `dest` with its timing, each frame capped
+    at `max_side` and no metadata (EXIF/XMP, comments) carried over."""
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(img):
+        durations.append(frame.info.get("duration", 100))
+        f = frame.copy()
+        f.info = {}
+        if max(f.size) > max_side: f.thumbnail((max_side, max_side))
+        frames.append(f)
+    frames[0].save(dest, fmt, save_all=True, append_images=frames[1:], duration=durations, loop=img.info.get("loop", 0))
+
+def _normalize_image(src: str, dest: str, fmt: str):
+    """Re-encodes `src` into `dest`: EXIF orientation applied, capped at
+    UPLOAD_MAX_DIMENSION, and no metadata (EXIF/GPS, text chunks) carried over."""
+    with Image.open(src) as img:
+        if getattr(img, "is_animated", False):
+            _save_animation(img, dest, fmt, UPLOAD_MAX_DIMENSION)
+            return
+        img = ImageOps.exif_transpose(img)
+        if max(img.size) > UPLOAD_MAX_DIMENSION:
+            img.thumbnail((UPLOAD_MAX_DIMENSION, UPLOAD_MAX_DIMENSION))
+        if fmt == "JPEG":
+            if img.mode not in ("RGB", "L"): img = img.convert("RGB")
+            img.save(dest, "JPEG", quality=85, optimize=True)
+        elif fmt == "WEBP":
+            img.save(dest, "WEBP", quality=85)
+        else:
+            img.save(dest, fmt, optimize=True)
+
+def save_upload(upload, dest_dir: str) -> str:
+    """Stores an uploaded image under its content hash and renders its variants.
+
+    The upload is copied to a temp file in UPLOAD_CHUNK pieces and hashed on
+    the way, so at most one chunk is held here. Raises UploadError for files
+    that are too big or not a supported image. Returns the path of the stored
+    original, which is what the DB keeps.
+    """
+    h, size = hashlib.sha256(), 0
+    upload.seek(0)
+    with tempfile.NamedTemporaryFile(dir=dest_dir, suffix=".upload", delete=False) as tmp:
+        try:
+            for chunk in iter(lambda: upload.read(UPLOAD_CHUNK), b""):
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise UploadError(f"Image is larger than {UPLOAD_MAX_BYTES // (1024 * 1024)} MB.")
+                h.update(chunk)
+                tmp.write(chunk)
+        except Exception:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    raw = tmp.name
+    try:
+        try:
+            with Image.open(raw) as img:
+                fmt = img.format
+                if img.width * img.height > UPLOAD_MAX_PIXELS: raise UploadError("Image dimensions are too large.")
+                if img.width * img.height * getattr(img, "n_frames", 1) > UPLOAD_MAX_ANIMATION_PIXELS:
+                    raise UploadError("Animation is too large.")
+                img.seek(0)
+                img.verify()
+        except (OSError, SyntaxError, Image.DecompressionBombError):
+            raise UploadError("That file isn't a valid image.")
+        if fmt not in UPLOAD_FORMATS: raise UploadError(f"Unsupported image format: {fmt}.")
+        digest = h.hexdigest()
+        path = os.path.join(dest_dir, digest + UPLOAD_FORMATS[fmt])
+        if not os.path.exists(path):
+            out = raw + UPLOAD_FORMATS[fmt]
+            try:
+                try:
+                    _normalize_image(raw, out, fmt)
+                except (OSError, Image.DecompressionBombError):
+                    # verify() only checks the structure; e.g. truncated JPEGs fail on decode
+                    raise UploadError("That file isn't a valid image.")
+                os.replace(out, path)
+            finally:
+                if os.path.exists(out): os.remove(out)
+    finally:
+        if os.path.exists(raw): os.remove(raw)
+    try:
+        make_variants(path, digest)
+    except (OSError, Image.DecompressionBombError):
+        raise UploadError("That file isn't a valid image.")
+    return path
+
+def _variant_file(digest: str, variant: str) -> Optional[str]:
+    for ext in (".webp", ".png", ".gif"):
+        f = os.path.join(MEDIA_DIR, f"{digest}_{variant}{ext}")
+        if os.path.exists(f): return f
+    return None
+
+def make_variants(path: str, digest: str):
+    started = time.perf_counter()
+    with Image.open(path) as img:
+        if getattr(img, "is_animated", False):
+            # the feed variant stays animated, in the original's format; avatars are stills
+            fmt = img.format if img.format in UPLOAD_FORMATS else "GIF"
+            feed = os.path.join(MEDIA_DIR, f"{digest}_feed{UPLOAD_FORMATS[fmt]}")
+            if not os.path.exists(feed):
+                _save_animation(img, feed, fmt, IMAGE_VARIANTS["feed"])
+            img.seek(0)
+            variants = {k: v for k, v in IMAGE_VARIANTS.items() if k != "feed"}
+        else:
+            variants = IMAGE_VARIANTS
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"): img = img.convert("RGBA")
+        for name, size in variants.items():
+            out = os.path.join(MEDIA_DIR, f"{digest}_{name}.webp")
+            if os.path.exists(out): continue
+            v = img.copy()
+            v.thumbnail((size, size))
+            v.save(out, "WEBP", quality=80)
+    get_metrics().record_image(started)
+
+@st.cache_resource
+def _legacy_digests() -> dict:
+    return {}
+
+def image_digest(path: str) -> Optional[str]:
+    """Content hash for a stored image; uploads from before the pipeline are
+    hashed and get their variants generated once per process."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if len(stem) == 64 and all(ch in "0123456789abcdef" for ch in stem):
+        return stem
+    known = _legacy_digests()
+    if path not in known:
+        try:
+            digest = _hash_file(path)
+            make_variants(path, digest)
+        except Exception:
+            digest = None
+        known[path] = digest
+    return known[path]
+
+def media_file(path: Optional[str], variant: str) -> Optional[str]:
+    """Local path of an image variant, or None if it can't be produced."""
+    if not path: return None
+    digest = image_digest(path)
+    return _variant_file(digest, variant) if digest else None
+
+@timed
+def media_url(path: Optional[str], variant: str, default: Optional[str] = None) -> Optional[str]:
+    f = media_file(path, variant)
+    if f: return f"{MEDIA_URL}/{os.path.basename(f)}"
+    # files Pillow can't decode are still inlined as before
+    b64 = get_image_base64(path) if path and os.path.exists(path) else None
+    return f"data:image/png;base64,{b64}" if b64 else default
+
 # -----------------------
 # DATA API
 # -----------------------
 def create_user(username: str, display_name: str, password: str, bio: str = "", profile_pic_path: Optional[str] = None) -> Optional[int]:
-    conn = get_conn()
-    c = conn.cursor()
-    wallet_addr, priv_key, mnemonic = generate_new_wallet()
+    wallets = get_wallet_pool()
+    wallet = wallets.claim()
+    wallet_addr, priv_key, mnemonic = wallet
+    row = (username, display_name, run_kdf(hash_password, password), bio, profile_pic_path, now_ts(), wallet_addr, priv_key, mnemonic)
     try:
-        c.execute(
+        user_id = run_write(lambda c: c.execute(
             """INSERT INTO users (username, display_name, password_hash, bio, profile_pic_path, created_at, wallet_address, private_key, mnemonic) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (username, display_name, hash_password(password), bio, profile_pic_path, now_ts(), wallet_addr, priv_key, mnemonic),
-        )
-        conn.commit()
-        return c.lastrowid
+            row,
+        ).lastrowid)
     except sqlite3.IntegrityError:
+        wallets.give_back(wallet)
         return None
+    invalidate_user(user_id, username)
+    return user_id
 
 def update_user_details(user_id: int, display_name: str, bio: str, new_pic_path: Optional[str] = None):
-    conn = get_conn()
-    c = conn.cursor()
     if new_pic_path:
-        c.execute("UPDATE users SET display_name = ?, bio = ?, profile_pic_path = ? WHERE id = ?", (display_name, bio, new_pic_path, user_id))
+        run_write(lambda c: c.execute("UPDATE users SET display_name = ?, bio = ?, profile_pic_path = ? WHERE id = ?", (display_name, bio, new_pic_path, user_id)))
     else:
-        c.execute("UPDATE users SET display_name = ?, bio = ? WHERE id = ?", (display_name, bio, user_id))
-    conn.commit()
+        run_write(lambda c: c.execute("UPDATE users SET display_name = ?, bio = ? WHERE id = ?", (display_name, bio, user_id)))
+    invalidate_user(user_id)
+    invalidate_profiles(user_id)
     return get_user_by_id(user_id)
 
 def authenticate(username: str, password: str) -> Optional[dict]:
+    """Verifies on the KDF pool; None for bad credentials or a rate-limited username
+    (check login_retry_after). Legacy hashes are upgraded on success."""
+    limiter = get_login_limiter()
+    if limiter.retry_after(username): return None
     c = get_conn().cursor()
-    c.execute("SELECT * FROM users WHERE username = ?", (username,))
+    c.execute("SELECT id, password_hash FROM users WHERE username = ?", (username,))
     row = c.fetchone()
-    if not row: return None
-    if row["password_hash"] == hash_password(password): return dict(row)
-    return None
-
+    # unknown users still pay for one hash, so timing doesn't reveal which names exist
+    ok, rehash = run_kdf(verify_password, password, row["password_hash"] if row else _dummy_hash())
+    if not (row and ok):
+        limiter.failed(username)
+        return None
+    limiter.succeeded(username)
+    if rehash:
+        new_hash = run_kdf(hash_password, password)
+        run_write(lambda c: c.execute("UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?", (new_hash, row["id"], row["password_hash"])))
+    return get_user_by_id(row["id"])
+
+# --- USER CACHE ---
+@st.cache_resource
+def get_user_cache() -> TTLCache:
+    return TTLCache(USER_CACHE_TTL)
+
+def _cached_user(key: tuple, where: str, value) -> Optional[dict]:
+    cache = get_user_cache()
+    user = cache.get(key)
+    if user is None:
+        row = get_conn().execute(f"SELECT {USER_COLUMNS} FROM users WHERE {where} = ?", (value,)).fetchone()
+        if not row: return None
+        user = dict(row)
+        cache.set(("id", user["id"]), user)
+        cache.set(("username", user["username"]), user)
+    return dict(user)
+
+@timed
 def get_user_by_id(user_id: int) -> Optional[dict]:
-    c = get_conn().cursor()
-    c.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    row = c.fetchone()
-    return dict(row) if row else None
+    return _cached_user(("id", user_id), "id", user_id)
 
+@timed
 def get_user_by_username(username: str) -> Optional[dict]:
-    c = get_conn().cursor()
-    c.execute("SELECT * FROM users WHERE username = ?", (username,))
-    row = c.fetchone()
-    return dict(row) if row else None
+    return _cached_user(("username", username), "username", username)
+
+def invalidate_user(user_id: int, username: Optional[str] = None):
+    cache = get_user_cache()
+    cache.invalidate_where(lambda k, v: v["id"] == user_id)
+    if username: cache.invalidate(("username", username))
 
+def user_cache_stats() -> dict:
+    return get_user_cache().stats()
+
+# --- SESSIONS ---
+@st.cache_resource
+def get_session_secret() -> bytes:
+    """APP_SESSION_SECRET, or a random key generated once and kept next to the DB."""
+    if os.environ.get("APP_SESSION_SECRET"): return os.environ["APP_SESSION_SECRET"].encode()
+    try:
+        with open(SESSION_SECRET_PATH, "rb") as f: return f.read()
+    except FileNotFoundError:
+        secret = secrets.token_hex(32).encode()
+        fd = os.open(SESSION_SECRET_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f: f.write(secret)
+        return secret
+
+@st.cache_resource
+def get_session_cache() -> TTLCache:
+    return TTLCache(SESSION_CACHE_TTL)
+
+def _sign(session_id: str) -> str:
+    return hmac.new(get_session_secret(), session_id.encode(), hashlib.sha256).hexdigest()
+
+def _token_hash(session_id: str) -> str:
+    return hashlib.sha256(session_id.encode()).hexdigest()
+
+def create_session(user_id: int, days: float = SESSION_DAYS) -> str:
+    """Stores a new session and returns the signed token for the cookie."""
+    session_id = secrets.token_urlsafe(32)
+    now = now_ts()
+    def _create(c):
+        c.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+        c.execute("INSERT INTO sessions (token_hash, user_id, created_at, expires_at) VALUES (?, ?, ?, ?)", (_token_hash(session_id), user_id, now, now + days * 86400))
+    run_write(_create)
+    return f"{session_id}.{_sign(session_id)}"
+
+def resolve_session(token: Optional[str]) -> Optional[int]:
+    """User id for a valid, unexpired token; forged tokens are rejected before any lookup."""
+    session_id, _, sig = (token or "").partition(".")
+    if not session_id or not hmac.compare_digest(sig, _sign(session_id)): return None
+    key = _token_hash(session_id)
+    cache = get_session_cache()
+    entry = cache.get(key)
+    if entry is None:
+        row = get_conn().execute("SELECT user_id, expires_at FROM sessions WHERE token_hash = ?", (key,)).fetchone()
+        if not row: return None
+        entry = (row["user_id"], row["expires_at"])
+        cache.set(key, entry)
+    return entry[0] if entry[1] > now_ts() else None
+
+def revoke_session(token: Optional[str]):
+    session_id = (token or "").partition(".")[0]
+    if not session_id: return
+    key = _token_hash(session_id)
+    run_write(lambda c: c.execute("DELETE FROM sessions WHERE token_hash = ?", (key,)))
+    get_session_cache().invalidate(key)
+
+def sync_session_cookie(manager, cookies: dict, state) -> Optional[str]:
+    """Applies state.pending_cookie and returns the cookie's session token to resolve, if any.
+
+    pending_cookie is ("set" | "delete", token, attempts). The cookie component only reports
+    its cookies again when they change on its side, so a stale read may never catch up: a
+    write is re-issued for at most COOKIE_WRITE_ATTEMPTS reruns, and the token this session
+    revoked is never resolved again.
+    """
+    pending = state.get("pending_cookie")
+    if pending:
+        op, token, attempts = pending
+        done = cookies.get(SESSION_COOKIE) == token if op == "set" else SESSION_COOKIE not in cookies
+        if done or attempts >= COOKIE_WRITE_ATTEMPTS:
+            state["pending_cookie"] = None
+        else:
+            if op == "set":
+                manager.set(SESSION_COOKIE, token, expires_at=datetime.now() + timedelta(days=SESSION_DAYS), key="session_set")
+            else:
+                manager.delete(SESSION_COOKIE, key="session_delete")
+            state["pending_cookie"] = (op, token, attempts + 1)
+            return None
+    token = cookies.get(SESSION_COOKIE)
+    return token if token and token != state.get("revoked_token") else None
+
+def get_wallet_keys(user_id: int) -> Tuple[Optional[str], Optional[str]]:
+    """(private_key, mnemonic), read straight from the table and never cached."""
+    row = get_conn().execute("SELECT private_key, mnemonic FROM users WHERE id = ?", (user_id,)).fetchone()
+    return (row["private_key"], row["mnemonic"]) if row else (None, None)
+
+@timed
 def create_post(user_id: int, text: str, image_path: Optional[str] = None, orig_post_id: Optional[int] = None) -> int:
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("INSERT INTO posts (user_id, text, image_path, created_at, orig_post_id) VALUES (?, ?, ?, ?, ?)", (user_id, text, image_path, now_ts(), orig_post_id))
-    post_id = c.lastrowid
-    conn.commit()
+    created = now_ts()
+    def _create(c):
+        c.execute("INSERT INTO posts (user_id, text, image_path, created_at, orig_post_id) VALUES (?, ?, ?, ?, ?)", (user_id, text, image_path, created, orig_post_id))
+        post_id = c.lastrowid
+        fan_out_post(c, user_id, post_id, created)
+        return post_id, index_terms(c, text, user_id, post_id, created)
+    post_id, mentioned = run_write(_create)
+    invalidate_profiles(user_id)
+    notify_mentions(user_id, mentioned, post_id)
     return post_id
 
+def fan_out_post(c: sqlite3.Cursor, author_id: int, post_id: int, created_at: float):
+    """Pushes a new post into its author's and (unless they're huge) followers' timelines."""
+    c.execute("INSERT OR IGNORE INTO timeline (user_id, created_at, post_id, author_id) VALUES (?, ?, ?, ?)", (author_id, created_at, post_id, author_id))
+    c.execute("SELECT follower_count FROM users WHERE id = ?", (author_id,))
+    row = c.fetchone()
+    if row and row["follower_count"] < TIMELINE_FANOUT_LIMIT:
+        c.execute("INSERT OR IGNORE INTO timeline (user_id, created_at, post_id, author_id) SELECT follower_id, ?, ?, ? FROM follows WHERE followed_id = ?", (created_at, post_id, author_id, author_id))
+
+@timed
 def follow_user(follower_id: int, followed_id: int) -> bool:
-    conn = get_conn()
-    c = conn.cursor()
-    try:
+    def _follow(c):
         c.execute("INSERT INTO follows (follower_id, followed_id, created_at) VALUES (?, ?, ?)", (follower_id, followed_id, now_ts()))
-        conn.commit()
-        create_notification(followed_id, f"@{get_user_by_id(follower_id)['username']} followed you")
-        return True
+        # backfill the new follower's timeline with the author's recent posts
+        c.execute("INSERT OR IGNORE INTO timeline (user_id, created_at, post_id, author_id) SELECT ?, created_at, id, user_id FROM posts WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (follower_id, followed_id, TIMELINE_BACKFILL))
+    try:
+        run_write(_follow)
     except sqlite3.IntegrityError:
         return False
+    invalidate_profiles(follower_id, followed_id)
+    notify(followed_id, "follow", follower_id)
+    return True
 
 def unfollow_user(follower_id: int, followed_id: int):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("DELETE FROM follows WHERE follower_id = ? AND followed_id = ?", (follower_id, followed_id))
-    conn.commit()
+    def _unfollow(c):
+        c.execute("DELETE FROM follows WHERE follower_id = ? AND followed_id = ?", (follower_id, followed_id))
+        c.execute("DELETE FROM timeline WHERE user_id = ? AND author_id = ?", (follower_id, followed_id))
+    run_write(_unfollow)
+    invalidate_profiles(follower_id, followed_id)
 
 def is_following(follower_id: int, followed_id: int) -> bool:
     c = get_conn().cursor()
     c.execute("SELECT 1 FROM follows WHERE follower_id = ? AND followed_id = ?", (follower_id, followed_id))
     return c.fetchone() is not None
 
+@timed
 def like_post(user_id: int, post_id: int) -> bool:
-    conn = get_conn()
-    c = conn.cursor()
-    try:
+    def _like(c):
         c.execute("INSERT INTO likes (user_id, post_id, created_at) VALUES (?, ?, ?)", (user_id, post_id, now_ts()))
-        conn.commit()
-        post = get_post(post_id)
-        if post: create_notification(post['user_id'], f"@{get_user_by_id(user_id)['username']} liked your post")
-        return True
+        return c.execute("SELECT user_id FROM posts WHERE id = ?", (post_id,)).fetchone()
+    try:
+        owner = run_write(_like)
     except sqlite3.IntegrityError:
         return False
+    if owner: notify(owner[0], "like", user_id, post_id)
+    return True
 
 def unlike_post(user_id: int, post_id: int):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("DELETE FROM likes WHERE user_id = ? AND post_id = ?", (user_id, post_id))
-    conn.commit()
+    run_write(lambda c: c.execute("DELETE FROM likes WHERE user_id = ? AND post_id = ?", (user_id, post_id)))
 
 def bookmark_post(user_id: int, post_id: int) -> bool:
-    conn = get_conn()
-    c = conn.cursor()
     try:
-        c.execute("INSERT INTO bookmarks (user_id, post_id, created_at) VALUES (?, ?, ?)", (user_id, post_id, now_ts()))
-        conn.commit()
+        run_write(lambda c: c.execute("INSERT INTO bookmarks (user_id, post_id, created_at) VALUES (?, ?, ?)", (user_id, post_id, now_ts())))
         return True
     except sqlite3.IntegrityError:
         return False
 
 def unbookmark_post(user_id: int, post_id: int):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("DELETE FROM bookmarks WHERE user_id = ? AND post_id = ?", (user_id, post_id))
-    conn.commit()
+    run_write(lambda c: c.execute("DELETE FROM bookmarks WHERE user_id = ? AND post_id = ?", (user_id, post_id)))
 
+@timed
 def reply_to_post(user_id: int, post_id: int, text: str):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("INSERT INTO replies (post_id, user_id, text, created_at) VALUES (?, ?, ?, ?)", (post_id, user_id, text, now_ts()))
-    conn.commit()
-    post = get_post(post_id)
-    if post: create_notification(post['user_id'], f"@{get_user_by_id(user_id)['username']} replied to your post")
-
+    created = now_ts()
+    def _reply(c):
+        c.execute("INSERT INTO replies (post_id, user_id, text, created_at) VALUES (?, ?, ?, ?)", (post_id, user_id, text, created))
+        mentioned = index_terms(c, text, user_id, post_id, created, reply_id=c.lastrowid)
+        return mentioned, c.execute("SELECT user_id FROM posts WHERE id = ?", (post_id,)).fetchone()
+    mentioned, owner = run_write(_reply)
+    notify_mentions(user_id, mentioned, post_id)
+    if owner: notify(owner[0], "reply", user_id, post_id)
+
+@timed
 def send_message(sender_id: int, receiver_id: int, text: str):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("INSERT INTO messages (sender_id, receiver_id, text, created_at) VALUES (?, ?, ?, ?)", (sender_id, receiver_id, text, now_ts()))
-    conn.commit()
-    create_notification(receiver_id, f"New message from @{get_user_by_id(sender_id)['username']}")
+    run_write(lambda c: c.execute("INSERT INTO messages (sender_id, receiver_id, text, created_at) VALUES (?, ?, ?, ?)", (sender_id, receiver_id, text, now_ts())))
+    notify(receiver_id, "message", sender_id, sender_id)
 
 def get_post(post_id: int) -> Optional[sqlite3.Row]:
     c = get_conn().cursor()
     c.execute("SELECT p.*, u.username, u.display_name, u.profile_pic_path FROM posts p JOIN users u ON p.user_id = u.id WHERE p.id = ?", (post_id,))
     return c.fetchone()
 
-def get_posts_for_user(user_id: int, limit=50) -> List[sqlite3.Row]:
+# --- KEYSET PAGINATION ---
+# List functions take `before`, a (created_at, id) cursor, and return rows
+# strictly older than it, newest first. None means "start from the top".
+Cursor = Tuple[float, int]
+CURSOR_START = (float("inf"), 0)
+
+def page_cursor(rows, limit: int, ts_key: str = "created_at", id_key: str = "id") -> Optional[Cursor]:
+    """Cursor for the page after `rows`, or None when this was the last page."""
+    if len(rows) < limit: return None
+    return (rows[-1][ts_key], rows[-1][id_key])
+
+POSTS_FOR_USER_SQL = "SELECT p.*, u.username, u.display_name, u.profile_pic_path FROM posts p JOIN users u ON p.user_id = u.id WHERE p.user_id = ? AND (p.created_at, p.id) < (?, ?) ORDER BY p.created_at DESC, p.id DESC LIMIT ?"
+RECENT_POSTS_SQL = "SELECT p.*, u.username, u.display_name, u.profile_pic_path FROM posts p JOIN users u ON p.user_id = u.id WHERE (p.created_at, p.id) < (?, ?) ORDER BY p.created_at DESC, p.id DESC LIMIT ?"
+LIKED_POSTS_SQL = "SELECT p.*, u.username, u.display_name, u.profile_pic_path, l.created_at as liked_at FROM posts p JOIN users u ON p.user_id = u.id JOIN likes l ON l.post_id = p.id WHERE l.user_id = ? AND (l.created_at, l.post_id) < (?, ?) ORDER BY l.created_at DESC, l.post_id DESC LIMIT ?"
+REPLIES_FOR_USER_SQL = "SELECT r.id as reply_id, r.text as reply_text, r.created_at as reply_created_at, p.id as orig_post_id, p.text as orig_text, p.image_path as orig_image, p.created_at as orig_created, u.username as orig_username, u.display_name as orig_display, u.profile_pic_path as orig_pic FROM replies r JOIN posts p ON r.post_id = p.id JOIN users u ON p.user_id = u.id WHERE r.user_id = ? AND (r.created_at, r.id) < (?, ?) ORDER BY r.created_at DESC, r.id DESC LIMIT ?"
+
+@timed
+def get_posts_for_user(user_id: int, limit=PAGE_SIZE, before: Optional[Cursor] = None) -> List[sqlite3.Row]:
     c = get_conn().cursor()
-    c.execute("SELECT p.*, u.username, u.display_name, u.profile_pic_path FROM posts p JOIN users u ON p.user_id = u.id WHERE p.user_id = ? ORDER BY p.created_at DESC LIMIT ?", (user_id, limit))
+    c.execute(POSTS_FOR_USER_SQL, (user_id, *(before or CURSOR_START), limit))
     return c.fetchall()
 
-def get_liked_posts_for_user(user_id: int) -> List[sqlite3.Row]:
+@timed
+def get_recent_posts(limit=PAGE_SIZE, before: Optional[Cursor] = None) -> List[sqlite3.Row]:
     c = get_conn().cursor()
-    c.execute("SELECT p.*, u.username, u.display_name, u.profile_pic_path FROM posts p JOIN users u ON p.user_id = u.id JOIN likes l ON l.post_id = p.id WHERE l.user_id = ? ORDER BY l.created_at DESC", (user_id,))
+    c.execute(RECENT_POSTS_SQL, (*(before or CURSOR_START), limit))
     return c.fetchall()
 
-def get_replies_for_user(user_id: int) -> List[sqlite3.Row]:
+@timed
+def get_liked_posts_for_user(user_id: int, limit=PAGE_SIZE, before: Optional[Cursor] = None) -> List[sqlite3.Row]:
+    """Ordered by like time; page with page_cursor(rows, limit, "liked_at")."""
     c = get_conn().cursor()
-    c.execute("SELECT r.id as reply_id, r.text as reply_text, r.created_at as reply_created_at, p.id as orig_post_id, p.text as orig_text, p.image_path as orig_image, p.created_at as orig_created, u.username as orig_username, u.display_name as orig_display, u.profile_pic_path as orig_pic FROM replies r JOIN posts p ON r.post_id = p.id JOIN users u ON p.user_id = u.id WHERE r.user_id = ? ORDER BY r.created_at DESC", (user_id,))
+    c.execute(LIKED_POSTS_SQL, (user_id, *(before or CURSOR_START), limit))
     return c.fetchall()
 
-def get_feed(user_id: int, limit=50) -> List[sqlite3.Row]:
+@timed
+def get_replies_for_user(user_id: int, limit=PAGE_SIZE, before: Optional[Cursor] = None) -> List[sqlite3.Row]:
+    """Page with page_cursor(rows, limit, "reply_created_at", "reply_id")."""
     c = get_conn().cursor()
-    c.execute("SELECT p.*, u.username, u.display_name, u.profile_pic_path FROM posts p JOIN users u ON p.user_id = u.id WHERE p.user_id IN (SELECT followed_id FROM follows WHERE follower_id = ?) OR p.user_id = ? ORDER BY p.created_at DESC LIMIT ?", (user_id, user_id, limit))
+    c.execute(REPLIES_FOR_USER_SQL, (user_id, *(before or CURSOR_START), limit))
+    return c.fetchall()
+
+FEED_SQL = """
+    SELECT p.*, u.username, u.display_name, u.profile_pic_path FROM posts p JOIN users u ON p.user_id = u.id
+    WHERE p.id IN (
+        SELECT post_id FROM (SELECT post_id FROM timeline WHERE user_id = ? AND (created_at, post_id) < (?, ?) ORDER BY created_at DESC, post_id DESC LIMIT ?)
+        UNION
+        SELECT id FROM (
+            SELECT cp.id FROM follows f JOIN users cu ON cu.id = f.followed_id JOIN posts cp ON cp.user_id = f.followed_id
+            WHERE f.follower_id = ? AND cu.follower_count >= ? AND (cp.created_at, cp.id) < (?, ?) ORDER BY cp.created_at DESC, cp.id DESC LIMIT ?
+        )
+    )
+    ORDER BY p.created_at DESC, p.id DESC LIMIT ?
+"""
+
+@timed
+def get_feed(user_id: int, limit=PAGE_SIZE, before: Optional[Cursor] = None) -> List[sqlite3.Row]:
+    """Home timeline: one range scan of the materialized timeline, merged with
+    posts from followed accounts that are too big to fan out on write."""
+    c = get_conn().cursor()
+    before = before or CURSOR_START
+    c.execute(FEED_SQL, (user_id, *before, limit, user_id, TIMELINE_FANOUT_LIMIT, *before, limit, limit))
     return c.fetchall()
 
 def get_likes_for_post(post_id: int) -> int:
     c = get_conn().cursor()
-    c.execute("SELECT COUNT(*) as cnt FROM likes WHERE post_id = ?", (post_id,))
-    return c.fetchone()["cnt"]
+    c.execute("SELECT like_count FROM posts WHERE id = ?", (post_id,))
+    row = c.fetchone()
+    return row["like_count"] if row else 0
 
 def get_following_count(user_id: int) -> int:
     c = get_conn().cursor()
-    c.execute("SELECT COUNT(followed_id) as cnt FROM follows WHERE follower_id = ?", (user_id,))
-    return c.fetchone()["cnt"]
+    c.execute("SELECT following_count FROM users WHERE id = ?", (user_id,))
+    row = c.fetchone()
+    return row["following_count"] if row else 0
 
 def get_follower_count(user_id: int) -> int:
     c = get_conn().cursor()
-    c.execute("SELECT COUNT(follower_id) as cnt FROM follows WHERE followed_id = ?", (user_id,))
-    return c.fetchone()["cnt"]
+    c.execute("SELECT follower_count FROM users WHERE id = ?", (user_id,))
+    row = c.fetchone()
+    return row["follower_count"] if row else 0
     
 def get_following_list(user_id: int) -> List[sqlite3.Row]:
     c = get_conn().cursor()
@@ -328,53 +1612,434 @@ def get_common_followers(my_id: int, target_id: int) -> List[sqlite3.Row]:
     """, (target_id, my_id))
     return c.fetchall()
 
+# --- PROFILES ---
+PROFILE_SQL = """
+    SELECT u.id, u.username, u.display_name, u.bio, u.profile_pic_path, u.created_at, u.wallet_address,
+           u.follower_count, u.following_count,
+           (SELECT COUNT(*) FROM posts WHERE user_id = u.id) AS post_count,
+           EXISTS (SELECT 1 FROM follows WHERE follower_id = :viewer AND followed_id = u.id) AS is_following,
+           (SELECT json_group_array(json_object('username', m.username, 'profile_pic_path', m.profile_pic_path))
+              FROM (SELECT mu.username, mu.profile_pic_path FROM follows f_target
+                    JOIN follows f_me ON f_me.followed_id = f_target.follower_id AND f_me.follower_id = :viewer
+                    JOIN users mu ON mu.id = f_target.follower_id
+                    WHERE f_target.followed_id = u.id AND u.id != :viewer LIMIT 3) m) AS mutuals
+    FROM users u WHERE u.username = :username
+"""
+
+@st.cache_resource
+def get_profile_cache() -> TTLCache:
+    return TTLCache(PROFILE_TTL)
+
+@timed
+def get_profile(username: str, viewer_id: int) -> Optional[dict]:
+    """Profile header (counts, follow state, up to 3 mutuals) in one query, cached per viewer."""
+    cache = get_profile_cache()
+    key = (username, viewer_id)
+    profile = cache.get(key)
+    if profile is None:
+        row = get_conn().execute(PROFILE_SQL, {"username": username, "viewer": viewer_id}).fetchone()
+        if not row: return None
+        profile = dict(row)
+        profile["is_following"] = bool(profile["is_following"])
+        profile["mutuals"] = json.loads(profile["mutuals"])
+        cache.set(key, profile)
+    return profile
+
+def invalidate_profiles(*user_ids: int):
+    """Drops cached headers of these users and everything they've viewed (follow state, mutuals)."""
+    ids = set(user_ids)
+    get_profile_cache().invalidate_where(lambda k, v: v["id"] in ids or k[1] in ids)
+
+REPLIES_FOR_POST_SQL = "SELECT r.*, u.username, u.display_name FROM replies r JOIN users u ON r.user_id = u.id WHERE r.post_id = ? ORDER BY r.created_at"
+BOOKMARKS_SQL = "SELECT p.*, u.username, u.display_name, u.profile_pic_path, b.created_at as bookmarked_at FROM bookmarks b JOIN posts p ON b.post_id = p.id JOIN users u ON p.user_id = u.id WHERE b.user_id = ? AND (b.created_at, b.post_id) < (?, ?) ORDER BY b.created_at DESC, b.post_id DESC LIMIT ?"
+MESSAGES_BETWEEN_SQL = "SELECT m.*, su.username as sender_name, ru.username as receiver_name FROM messages m JOIN users su ON m.sender_id = su.id JOIN users ru ON m.receiver_id = ru.id WHERE (sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?) ORDER BY m.created_at"
+MESSAGES_SINCE_SQL = "SELECT id, sender_id, receiver_id, text, created_at FROM messages WHERE ((sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?)) AND id > ? ORDER BY id"
+
 def get_replies_for_post(post_id: int) -> List[sqlite3.Row]:
     c = get_conn().cursor()
-    c.execute("SELECT r.*, u.username, u.display_name FROM replies r JOIN users u ON r.user_id = u.id WHERE r.post_id = ? ORDER BY r.created_at", (post_id,))
+    c.execute(REPLIES_FOR_POST_SQL, (post_id,))
     return c.fetchall()
 
-def get_bookmarks_for_user(user_id: int) -> List[sqlite3.Row]:
+@timed
+def get_bookmarks_for_user(user_id: int, limit=PAGE_SIZE, before: Optional[Cursor] = None) -> List[sqlite3.Row]:
+    """Ordered by bookmark time; page with page_cursor(rows, limit, "bookmarked_at")."""
     c = get_conn().cursor()
-    c.execute("SELECT p.*, u.username, u.display_name, u.profile_pic_path FROM bookmarks b JOIN posts p ON b.post_id = p.id JOIN users u ON p.user_id = u.id WHERE b.user_id = ? ORDER BY b.created_at DESC", (user_id,))
+    c.execute(BOOKMARKS_SQL, (user_id, *(before or CURSOR_START), limit))
     return c.fetchall()
 
+@timed
 def get_messages_between(a: int, b: int) -> List[sqlite3.Row]:
     c = get_conn().cursor()
-    c.execute("SELECT m.*, su.username as sender_name, ru.username as receiver_name FROM messages m JOIN users su ON m.sender_id = su.id JOIN users ru ON m.receiver_id = ru.id WHERE (sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?) ORDER BY m.created_at", (a, b, b, a))
+    c.execute(MESSAGES_BETWEEN_SQL, (a, b, b, a))
     return c.fetchall()
 
+@timed
+def get_messages_since(a: int, b: int, after_id: int = 0) -> List[sqlite3.Row]:
+    """Messages between a and b with id > after_id, oldest first (no user joins)."""
+    c = get_conn().cursor()
+    c.execute(MESSAGES_SINCE_SQL, (a, b, b, a, after_id))
+    return c.fetchall()
+
+# --- HASHTAGS, MENTIONS & TRENDING ---
+HASHTAG_RE = re.compile(r"(?<!\w)#(\w{1,50})")
+MENTION_RE = re.compile(r"(?<!\w)@(\w{1,30})")
+
+def extract_terms(text: Optional[str]) -> Tuple[set, set]:
+    """(lowercased hashtags, mentioned usernames) found in a post or reply."""
+    if not text: return set(), set()
+    return {t.lower() for t in HASHTAG_RE.findall(text)}, set(MENTION_RE.findall(text))
+
+def _bump_trending(c: sqlite3.Cursor, tags: set, ts: float):
+    # Each tag keeps log(sum of exp(t_i * rate)) over its uses. Ordering by it is the
+    # same as ordering by the exponentially decayed count at any moment, so the
+    # counter only changes on use and the panel is an index walk, not a posts scan.
+    rate = math.log(2) / TREND_HALF_LIFE
+    for tag in tags:
+        x = ts * rate
+        row = c.execute("SELECT log_score FROM trending WHERE tag = ?", (tag,)).fetchone()
+        if row:
+            x = max(row[0], x) + math.log1p(math.exp(-abs(row[0] - x)))
+        c.execute("INSERT INTO trending (tag, log_score, last_used) VALUES (?, ?, ?) ON CONFLICT(tag) DO UPDATE SET log_score = excluded.log_score, last_used = MAX(last_used, excluded.last_used)", (tag, x, ts))
+
+def index_terms(c: sqlite3.Cursor, text: Optional[str], author_id: int, post_id: int, created_at: float, reply_id: int = 0) -> List[int]:
+    """Stores a post's (or reply's) hashtags and mentions in the caller's
+    transaction; returns the ids of mentioned users other than the author."""
+    tags, names = extract_terms(text)
+    c.executemany("INSERT OR IGNORE INTO hashtags (tag, created_at, post_id, reply_id) VALUES (?, ?, ?, ?)", [(t, created_at, post_id, reply_id) for t in tags])
+    _bump_trending(c, tags, created_at)
+    if not names: return []
+    names = list(names)
+    c.execute(f"SELECT id FROM users WHERE username IN ({','.join('?' * len(names))})", names)
+    mentioned = [r[0] for r in c.fetchall() if r[0] != author_id]
+    c.executemany("INSERT OR IGNORE INTO mentions (user_id, created_at, post_id, reply_id, author_id) VALUES (?, ?, ?, ?, ?)", [(uid, created_at, post_id, reply_id, author_id) for uid in mentioned])
+    return mentioned
+
+def notify_mentions(author_id: int, user_ids: List[int], post_id: int):
+    for uid in user_ids: notify(uid, "mention", author_id, post_id)
+
+TAG_POSTS_SQL = "SELECT p.*, u.username, u.display_name, u.profile_pic_path FROM hashtags h JOIN posts p ON p.id = h.post_id JOIN users u ON p.user_id = u.id WHERE h.tag = ? AND h.reply_id = 0 AND (h.created_at, h.post_id) < (?, ?) ORDER BY h.created_at DESC, h.post_id DESC LIMIT ?"
+
+@timed
+def get_trending(limit: int = 10) -> List[dict]:
+    """Top hashtags by time-decayed use count, as [{tag, score}]."""
+    now = now_ts()
+    rate = math.log(2) / TREND_HALF_LIFE
+    c = get_conn().cursor()
+    c.execute("SELECT tag, log_score FROM trending WHERE last_used >= ? ORDER BY log_score DESC LIMIT ?", (now - TREND_WINDOW, limit))
+    return [{"tag": r["tag"], "score": math.exp(r["log_score"] - now * rate)} for r in c.fetchall()]
+
+@timed
+def get_posts_for_tag(tag: str, limit=PAGE_SIZE, before: Optional[Cursor] = None) -> List[sqlite3.Row]:
+    c = get_conn().cursor()
+    c.execute(TAG_POSTS_SQL, (tag.lstrip("#").lower(), *(before or CURSOR_START), limit))
+    return c.fetchall()
+
+# --- FULL-TEXT SEARCH ---
+SEARCH_RECENCY_WEIGHT = 0.1  # bm25 points a post loses per day of age
+SEARCH_CANDIDATES = 500  # best bm25 matches that get re-ranked by recency
+# "ORDER BY rank LIMIT n" is answered inside FTS5, so snippets and joins only run for the top n
+SEARCH_USERS_SQL = f"""
+    SELECT {USER_COLUMNS} FROM (SELECT rowid, rank FROM users_fts WHERE users_fts MATCH ? ORDER BY rank LIMIT 50) m
+    JOIN users ON users.id = m.rowid ORDER BY m.rank
+"""
+SEARCH_POSTS_SQL = """
+    SELECT p.*, u.username, u.display_name, u.profile_pic_path, m.snippet
+    FROM (SELECT rowid, rank, snippet(posts_fts, 0, '<mark>', '</mark>', '…', 32) as snippet
+          FROM posts_fts WHERE posts_fts MATCH ? ORDER BY rank LIMIT ?) m
+    JOIN posts p ON p.id = m.rowid JOIN users u ON p.user_id = u.id
+    ORDER BY m.rank + ? * ((? - p.created_at) / 86400.0) LIMIT ?
+"""
+
+def fts_query(term: str) -> Optional[str]:
+    """Turns user input into an FTS5 query: "quoted phrases" stay phrases,
+    every other word becomes a prefix match. None if nothing is searchable."""
+    parts = []
+    for i, chunk in enumerate(term.split('"')):
+        if i % 2:  # inside quotes
+            words = chunk.split()
+            if words: parts.append('"' + " ".join(words) + '"')
+        else:
+            parts += [f'"{w}"*' for w in chunk.split() if any(ch.isalnum() for ch in w)]
+    return " ".join(parts) or None
+
+@timed
 def search_users(term: str) -> List[sqlite3.Row]:
+    q = fts_query(term)
+    if not q: return []
     c = get_conn().cursor()
-    q = f"%{term}%"
-    c.execute("SELECT * FROM users WHERE username LIKE ? OR display_name LIKE ? LIMIT 50", (q, q))
+    try:
+        c.execute(SEARCH_USERS_SQL, (q,))
+    except sqlite3.OperationalError:
+        return []
     return c.fetchall()
 
-def search_posts(term: str) -> List[sqlite3.Row]:
+@timed
+def search_posts(term: str, limit: int = 100) -> List[sqlite3.Row]:
+    """The SEARCH_CANDIDATES best BM25 matches re-ranked with an age penalty,
+    each with a <mark>-highlighted snippet."""
+    q = fts_query(term)
+    if not q: return []
     c = get_conn().cursor()
-    q = f"%{term}%"
-    c.execute("SELECT p.*, u.username, u.display_name, u.profile_pic_path FROM posts p JOIN users u ON p.user_id = u.id WHERE p.text LIKE ? ORDER BY p.created_at DESC LIMIT 100", (q,))
+    try:
+        c.execute(SEARCH_POSTS_SQL, (q, SEARCH_CANDIDATES, SEARCH_RECENCY_WEIGHT, now_ts(), limit))
+    except sqlite3.OperationalError:
+        return []
     return c.fetchall()
 
 def create_notification(user_id: int, text: str):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("INSERT INTO notifications (user_id, text, seen, created_at) VALUES (?, ?, 0, ?)", (user_id, text, now_ts()))
-    conn.commit()
+    run_write(lambda c: c.execute("INSERT INTO notifications (user_id, text, seen, created_at) VALUES (?, ?, 0, ?)", (user_id, text, now_ts())))
+
+# --- NOTIFICATION QUEUE ---
+# (one, two, more) texts per kind by actor_count; {others} = actor_count - 1
+NOTIFICATION_TEMPLATES = {
+    "follow": ("@{actor} followed you", "@{actor} and 1 other followed you", "@{actor} and {others} others followed you"),
+    "like": ("@{actor} liked your post", "@{actor} and 1 other liked your post", "@{actor} and {others} others liked your post"),
+    "reply": ("@{actor} replied to your post", "@{actor} and 1 other replied to your post", "@{actor} and {others} others replied to your post"),
+    "mention": ("@{actor} mentioned you", "@{actor} and 1 other mentioned you", "@{actor} and {others} others mentioned you"),
+    "message": ("New message from @{actor}", "{count} new messages from @{actor}", "{count} new messages from @{actor}"),
+}
+# actor_count counts distinct actors (via notification_actors), except for these
+# kinds, whose only actor is the target itself, where it counts events
+EVENT_COUNTED_KINDS = {"message"}
+
+def notification_text(n) -> str:
+    n = dict(n)
+    if n.get('kind') not in NOTIFICATION_TEMPLATES: return n['text']
+    count = n.get('actor_count') or 1
+    template = NOTIFICATION_TEMPLATES[n['kind']][min(count, 3) - 1]
+    return template.format(actor=n['actor'], others=count - 1, count=count)
+
+class NotificationQueue:
+    """Collects notification events off the request path and writes them in batches.
+
+    A worker thread gathers events for NOTIFY_FLUSH_SECONDS, folds repeats of
+    the same (recipient, kind, target) together, resolves actor usernames in
+    one query and upserts everything in a single transaction. Unseen rows are
+    coalesced further in the DB, so storage grows with distinct targets; their
+    distinct actors are kept in notification_actors for the "and N others" count.
+    """
 
-def get_notifications(user_id: int) -> List[sqlite3.Row]:
+    def __init__(self, flush_seconds: float = NOTIFY_FLUSH_SECONDS, batch_max: int = NOTIFY_BATCH_MAX):
+        self.flush_seconds = flush_seconds
+        self.batch_max = batch_max
+        self._queue = queue.Queue()
+        self._flush_lock = threading.Lock()
+        self._lock = threading.Lock()  # guards _stats; put() runs on every script thread
+        self._stop = threading.Event()
+        self._stats = {"enqueued": 0, "written": 0, "batches": 0, "failed": 0}
+        self._thread = threading.Thread(target=self._run, name="notification-worker", daemon=True)
+        self._thread.start()
+
+    def put(self, user_id: int, kind: str, actor_id: int, target_id: int = 0):
+        self._queue.put((user_id, kind, target_id or 0, actor_id, now_ts()))
+        self._count("enqueued")
+
+    def _run(self):
+        last_compact = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() - last_compact > NOTIFY_COMPACT_SECONDS:
+                try: compact_notifications()
+                except Exception: pass
+                last_compact = time.monotonic()
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            time.sleep(self.flush_seconds)  # let a burst accumulate
+            self.flush([first])
+
+    def flush(self, batch: Optional[list] = None):
+        """Writes `batch` plus everything queued so far; safe to call from any thread."""
+        batch = batch or []
+        while len(batch) < self.batch_max:
+            try: batch.append(self._queue.get_nowait())
+            except queue.Empty: break
+        if not batch: return
+        with self._flush_lock:
+            try:
+                self._write(batch)
+                self._count("written", len(batch))
+                self._count("batches")
+            except Exception:
+                self._count("failed", len(batch))
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _write(self, batch: list):
+        merged = {}  # (user_id, kind, target_id) -> [{actor_id: None} in event order, event count, last ts]
+        for user_id, kind, target_id, actor_id, ts in batch:
+            entry = merged.setdefault((user_id, kind, target_id), [{}, 0, ts])
+            entry[0].pop(actor_id, None)
+            entry[0][actor_id] = None
+            entry[1], entry[2] = entry[1] + 1, ts
+        conn = get_conn()
+        actor_ids = list({a for e in merged.values() for a in e[0]})
+        names = {}
+        for chunk in _chunks(actor_ids):
+            names.update(conn.execute(f"SELECT id, username FROM users WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall())
+        rows, actors, recount = [], [], []
+        for (user_id, kind, target_id), (actor_set, events, ts) in merged.items():
+            known = [a for a in actor_set if a in names]
+            if not known: continue
+            actor = names[known[-1]]
+            count = events if kind in EVENT_COUNTED_KINDS else len(known)
+            rows.append((user_id, NOTIFICATION_TEMPLATES[kind][0].format(actor=actor), ts, kind, target_id, actor, count))
+            if kind not in EVENT_COUNTED_KINDS:
+                actors += [(a, user_id, kind, target_id) for a in known]
+                recount.append((user_id, kind, target_id))
+        def _upsert(c):
+            c.executemany("""
+                INSERT INTO notifications (user_id, text, seen, created_at, kind, target_id, actor, actor_count) VALUES (?, ?, 0, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id, kind, target_id) WHERE seen = 0 AND kind IS NOT NULL
+                DO UPDATE SET actor = excluded.actor, text = excluded.text, created_at = excluded.created_at, actor_count = actor_count + excluded.actor_count
+            """, rows)
+            # a repeat actor (like, unlike, like again) doesn't raise the count
+            c.executemany("""
+                INSERT OR IGNORE INTO notification_actors (notification_id, actor_id)
+                SELECT id, ? FROM notifications WHERE user_id = ? AND kind = ? AND target_id = ? AND seen = 0
+            """, actors)
+            c.executemany("""
+                UPDATE notifications SET actor_count = (SELECT COUNT(*) FROM notification_actors WHERE notification_id = notifications.id)
+                WHERE user_id = ? AND kind = ? AND target_id = ? AND seen = 0
+            """, recount)
+        run_write(_upsert)
+
+    def stop(self):
+        """Stops the worker and writes what is still queued, the worker's last batch included."""
+        self._stop.set()
+        self._thread.join(self.flush_seconds + 1)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, pending=self._queue.qsize())
+
+@st.cache_resource
+def get_notification_queue() -> NotificationQueue:
+    q = NotificationQueue()
+    atexit.register(q.stop)
+    return q
+
+def notify(user_id: int, kind: str, actor_id: int, target_id: int = 0):
+    """Queues a coalescable notification; see NOTIFICATION_TEMPLATES for kinds."""
+    get_notification_queue().put(user_id, kind, actor_id, target_id)
+
+NOTIFICATIONS_SQL = "SELECT * FROM notifications WHERE user_id = ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?"
+NEW_NOTIFICATIONS_SQL = "SELECT * FROM notifications WHERE user_id = ? AND created_at > ? ORDER BY created_at DESC, id DESC"
+
+@timed
+def get_notifications(user_id: int, limit=PAGE_SIZE, before: Optional[Cursor] = None) -> List[sqlite3.Row]:
     c = get_conn().cursor()
-    c.execute("SELECT * FROM notifications WHERE user_id = ? ORDER BY created_at DESC LIMIT 200", (user_id,))
+    c.execute(NOTIFICATIONS_SQL, (user_id, *(before or CURSOR_START), limit))
     return c.fetchall()
 
+@timed
+def get_new_notifications(user_id: int, since: float) -> List[sqlite3.Row]:
+    """Rows created (or re-coalesced) after `since`, newest first."""
+    c = get_conn().cursor()
+    c.execute(NEW_NOTIFICATIONS_SQL, (user_id, since))
+    return c.fetchall()
+
+def get_unread_count(user_id: int) -> int:
+    c = get_conn().cursor()
+    c.execute("SELECT notif_unread FROM users WHERE id = ?", (user_id,))
+    row = c.fetchone()
+    return row["notif_unread"] if row else 0
+
 def mark_notifications_seen(user_id: int):
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("UPDATE notifications SET seen = 1 WHERE user_id = ?", (user_id,))
-    conn.commit()
+    """Marks the user's unseen rows via idx_notifications_unread; no write when nothing is unread."""
+    row = get_conn().execute("SELECT notif_unread FROM users WHERE id = ?", (user_id,)).fetchone()
+    if not row or not row["notif_unread"]: return
+    run_write(lambda c: c.execute("UPDATE notifications SET seen = 1 WHERE user_id = ? AND seen = 0", (user_id,)))
+
+def compact_notifications(retention_days: float = NOTIFICATION_RETENTION_DAYS) -> int:
+    """Deletes seen notifications older than the retention window; returns rows removed."""
+    cutoff = now_ts() - retention_days * 86400
+    return run_write(lambda c: c.execute("DELETE FROM notifications WHERE seen = 1 AND created_at < ?", (cutoff,)).rowcount)
+
+# -----------------------
+# QUERY PLAN CHECKS
+# -----------------------
+# Representative statements for the hot read paths, checked by check_query_plans()
+HOT_QUERY_PLANS = {
+    "get_feed": (FEED_SQL, (1, *CURSOR_START, PAGE_SIZE, 1, TIMELINE_FANOUT_LIMIT, *CURSOR_START, PAGE_SIZE, PAGE_SIZE)),
+    "get_posts_for_user": (POSTS_FOR_USER_SQL, (1, *CURSOR_START, PAGE_SIZE)),
+    "get_recent_posts": (RECENT_POSTS_SQL, (*CURSOR_START, PAGE_SIZE)),
+    "get_liked_posts_for_user": (LIKED_POSTS_SQL, (1, *CURSOR_START, PAGE_SIZE)),
+    "get_replies_for_user": (REPLIES_FOR_USER_SQL, (1, *CURSOR_START, PAGE_SIZE)),
+    "get_bookmarks_for_user": (BOOKMARKS_SQL, (1, *CURSOR_START, PAGE_SIZE)),
+    "get_replies_for_post": (REPLIES_FOR_POST_SQL, (1,)),
+    "get_likes_for_post": ("SELECT like_count FROM posts WHERE id = ?", (1,)),
+    "get_follower_count": ("SELECT follower_count FROM users WHERE id = ?", (1,)),
+    "get_profile": (PROFILE_SQL, {"username": "u1", "viewer": 2}),
+    "get_posts_for_tag": (TAG_POSTS_SQL, ("tag", *CURSOR_START, PAGE_SIZE)),
+    "search_users": (SEARCH_USERS_SQL, ('"u"*',)),
+    "search_posts": (SEARCH_POSTS_SQL, ('"word"*', SEARCH_CANDIDATES, SEARCH_RECENCY_WEIGHT, 0, 100)),
+    "get_notifications": (NOTIFICATIONS_SQL, (1, *CURSOR_START, PAGE_SIZE)),
+    "get_new_notifications": (NEW_NOTIFICATIONS_SQL, (1, 0)),
+    "get_messages_since": (MESSAGES_SINCE_SQL, (1, 2, 2, 1, 0)),
+    "get_messages_between": (MESSAGES_BETWEEN_SQL, (1, 2, 2, 1)),
+}
+
+def check_query_plans(conn: Optional[sqlite3.Connection] = None) -> dict:
+    """Returns {name: [plan lines]} for hot queries whose plan contains a full table SCAN."""
+    conn = conn or get_conn()
+    scans = {}
+    for name, (sql, params) in HOT_QUERY_PLANS.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        # "SCAN (subquery-N)" and scans of a CO-ROUTINE or MATERIALIZEd subquery walk an already-bounded
+        # intermediate result, not a table; an FTS5 "VIRTUAL TABLE INDEX n:M..." scan is a MATCH lookup
+        coroutines = {line.split()[-1] for line in plan if line.startswith(("CO-ROUTINE", "MATERIALIZE"))}
+        if any(line.startswith("SCAN") and "subquery" not in line and line.split()[1] not in coroutines
+               and not ("VIRTUAL TABLE INDEX" in line and ":M" in line) for line in plan):
+            scans[name] = plan
+    return scans
+
+# -----------------------
+# POST HYDRATION
+# -----------------------
+SQL_IN_CHUNK = 500  # stay well below SQLITE_MAX_VARIABLE_NUMBER
+
+def _chunks(ids: list, size: int = SQL_IN_CHUNK):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+@timed
+def hydrate_posts(posts, viewer_id: Optional[int] = None, with_replies: bool = True) -> List[dict]:
+    """Turns a page of post rows into view models for render_post.
+
+    The viewer's like/bookmark flags and replies are fetched with one
+    set-based query each (per chunk of ids), instead of 4 queries per post.
+    Counts are always re-read from posts.like_count/reply_count, since rows
+    may come from pages kept in session state across reruns.
+    """
+    views = [dict(p) for p in posts]
+    ids = list({v['id'] for v in views})
+    counts, liked, bookmarked, replies = {}, set(), set(), {}
+    c = get_conn().cursor()
+    for chunk in _chunks(ids):
+        marks = ",".join("?" * len(chunk))
+        for row in c.execute(f"SELECT id, like_count, reply_count FROM posts WHERE id IN ({marks})", chunk):
+            counts[row['id']] = (row['like_count'], row['reply_count'])
+        if viewer_id is not None:
+            liked.update(r[0] for r in c.execute(f"SELECT post_id FROM likes WHERE user_id = ? AND post_id IN ({marks})", (viewer_id, *chunk)))
+            bookmarked.update(r[0] for r in c.execute(f"SELECT post_id FROM bookmarks WHERE user_id = ? AND post_id IN ({marks})", (viewer_id, *chunk)))
+        if with_replies:
+            for r in c.execute(f"SELECT r.*, u.username, u.display_name FROM replies r JOIN users u ON r.user_id = u.id WHERE r.post_id IN ({marks}) ORDER BY r.created_at", chunk):
+                replies.setdefault(r['post_id'], []).append(dict(r))
+    for v in views:
+        v['like_count'], v['reply_count'] = counts.get(v['id'], (0, 0))
+        v['liked'] = v['id'] in liked
+        v['bookmarked'] = v['id'] in bookmarked
+        v['replies'] = replies.get(v['id'], [])
+    return views
 
 # --- RENDER POST (Updated: Divider Between Posts) ---
-def render_post(p, key_prefix: str = "default"):
-    p = dict(p)
+@timed
+def render_post(p: dict, key_prefix: str = "default"):
+    """Renders one view model from hydrate_posts(); issues no queries itself."""
     st.write("\n")
     
     with st.container(border=True):
@@ -382,10 +2047,7 @@ def render_post(p, key_prefix: str = "default"):
         
         # 1. Profile Picture Column
         with header_cols[0]:
-            img_src = "https://cdn-icons-png.flaticon.com/512/149/149071.png"
-            if p.get('profile_pic_path') and os.path.exists(p['profile_pic_path']):
-                b64 = get_image_base64(p['profile_pic_path'])
-                if b64: img_src = f"data:image/png;base64,{b64}"
+            img_src = media_url(p.get('profile_pic_path'), "avatar", DEFAULT_AVATAR)
             
             # Circular Avatar
             st.markdown(f"""
@@ -408,16 +2070,15 @@ def render_post(p, key_prefix: str = "default"):
             
         # --- MESSAGE TEXT SIZE INCREASED (1.4em) ---
         if p.get('text'): 
-            st.markdown(f"<div style='margin-top: 10px; font-size: 1.4em; line-height: 1.4; color: #000;'>{p['text']}</div>", unsafe_allow_html=True)
+            # search results carry a highlighted snippet instead of the plain text
+            st.markdown(f"<div style='margin-top: 10px; font-size: 1.4em; line-height: 1.4; color: #000;'>{p.get('snippet') or p['text']}</div>", unsafe_allow_html=True)
         
         # Post Image (if any)
         if p.get('image_path'):
-            abs_path = os.path.abspath(p['image_path'])
-            if os.path.exists(abs_path):
-                b64_str = get_image_base64(abs_path)
-                if b64_str:
-                    html = f"""<div style="width: 100%; margin-top: 10px; border: 3px solid black; box-shadow: 4px 4px 0px 0px black; overflow: hidden;"><img src="data:image/png;base64,{b64_str}" style="width: 100%; height: auto; display: block; object-fit: cover;"></div>"""
-                    st.markdown(html, unsafe_allow_html=True)
+            post_img = media_url(p['image_path'], "feed")
+            if post_img:
+                html = f"""<div style="width: 100%; margin-top: 10px; border: 3px solid black; box-shadow: 4px 4px 0px 0px black; overflow: hidden;"><img src="{post_img}" style="width: 100%; height: auto; display: block; object-fit: cover;"></div>"""
+                st.markdown(html, unsafe_allow_html=True)
 
         st.write("") 
         st.write("") 
@@ -427,34 +2088,35 @@ def render_post(p, key_prefix: str = "default"):
         post_id = p['id']
         user = st.session_state.user
         
-        liked = False
-        bookmarked = False
-        if user:
-            liked = get_conn().cursor().execute("SELECT 1 FROM likes WHERE user_id = ? AND post_id = ?", (user['id'], post_id)).fetchone() is not None
-            bookmarked = get_conn().cursor().execute("SELECT 1 FROM bookmarks WHERE user_id = ? AND post_id = ?", (user['id'], post_id)).fetchone() is not None
+        liked = p['liked']
+        bookmarked = p['bookmarked']
         
         like_icon = "❤️" if liked else "🤍"
         bookmark_icon = "✅" if bookmarked else "🔖"
 
         if user:
-            if row[0].button(f"{like_icon} {get_likes_for_post(post_id)}", key=f"{key_prefix}_like:{post_id}"):
-                if liked: unlike_post(user['id'], post_id)
+            if row[0].button(f"{like_icon} {p['like_count']}", key=f"{key_prefix}_like:{post_id}"):
+                if liked:
+                    unlike_post(user['id'], post_id)
+                    drop_paged_row(f"prof_likes:{user['id']}", post_id)
                 else: like_post(user['id'], post_id)
                 st.rerun()
             if row[1].button("💬 Reply", key=f"{key_prefix}_reply:{post_id}"):
                 st.session_state.view = f"reply:{post_id}"
                 st.rerun()
             if row[2].button(f"{bookmark_icon} Save", key=f"{key_prefix}_bm:{post_id}"):
-                if bookmarked: unbookmark_post(user['id'], post_id)
+                if bookmarked:
+                    unbookmark_post(user['id'], post_id)
+                    drop_paged_row("bookmarks", post_id)
                 else: bookmark_post(user['id'], post_id)
                 st.rerun()
         else:
-            row[0].write(f"❤️ {get_likes_for_post(post_id)}")
+            row[0].write(f"❤️ {p['like_count']}")
             row[1].write("💬")
             row[2].write("🔖")
             
         if key_prefix != "reply_ctx":
-            replies = get_replies_for_post(post_id)
+            replies = p['replies']
             if replies:
                 with st.expander(f"{len(replies)} replies"):
                     for r in replies:
@@ -462,12 +2124,70 @@ def render_post(p, key_prefix: str = "default"):
                         st.write(r['text'])
 
     st.markdown("---")
+
+def render_posts(posts, key_prefix: str = "default", with_replies: bool = True):
+    user = st.session_state.user
+    for p in hydrate_posts(posts, user['id'] if user else None, with_replies): render_post(p, key_prefix)
+
+# --- PAGED LISTS (kept in session state, extended by "Load more") ---
+def paged_rows(key: str, fetch, ts_key: str = "created_at", id_key: str = "id") -> List[dict]:
+    """Rows loaded so far for a list; `fetch(before)` returns one page of rows."""
+    pages = st.session_state.pages
+    if key not in pages:
+        rows = fetch(None)
+        pages[key] = {"rows": [dict(r) for r in rows], "cursor": page_cursor(rows, PAGE_SIZE, ts_key, id_key), "fetch": fetch, "keys": (ts_key, id_key)}
+    return pages[key]["rows"]
+
+def load_more_button(key: str):
+    state = st.session_state.pages[key]
+    if state["cursor"] and st.button("Load more", key=f"more:{key}", use_container_width=True):
+        rows = state["fetch"](state["cursor"])
+        state["rows"] += [dict(r) for r in rows]
+        state["cursor"] = page_cursor(rows, PAGE_SIZE, *state["keys"])
+        st.rerun()
+
+def drop_paged_row(key: str, post_id: int):
+    """Removes a post from a loaded list, e.g. once it's unliked in your Likes tab."""
+    state = st.session_state.get("pages", {}).get(key)
+    if state: state["rows"] = [r for r in state["rows"] if r["id"] != post_id]
+
+def navigate(view: str):
+    """Sidebar navigation; clicking the view you're on reloads its lists from the top."""
+    st.session_state.view = view
+    st.session_state.pop("paged_view", None)
+    st.rerun()
+
+def render_paged_posts(key: str, fetch, key_prefix: str, empty_msg: str, ts_key: str = "created_at"):
+    posts = paged_rows(key, fetch, ts_key)
+    if not posts: st.info(empty_msg)
+    render_posts(posts, key_prefix)
+    load_more_button(key)
+
 # --- REAL-TIME CHAT FRAGMENT ---
-@st.fragment(run_every=2)
-# --- REAL-TIME CHAT FRAGMENT ---
+# Poll intervals (seconds) for an open chat; each CHAT_IDLE_POLLS polls without
+# new messages steps to the next (slower) interval, any new message resets it.
+CHAT_POLL_INTERVALS = (2, 5, 15)
+CHAT_IDLE_POLLS = 5
 
 def render_realtime_chat(current_user_id, other_user_id, current_user_name, other_user_name):
-    msgs = get_messages_between(current_user_id, other_user_id)
+    chats = st.session_state.setdefault("chats", {})
+    state = chats.setdefault((current_user_id, other_user_id), {"msgs": [], "last_id": 0, "idle": 0, "tier": 0})
+    # run_every is fixed per fragment, so the fragment is (re)built with the current tier
+    st.fragment(run_every=CHAT_POLL_INTERVALS[state["tier"]])(_chat_fragment)(state, current_user_id, other_user_id)
+
+def _chat_fragment(state: dict, current_user_id, other_user_id):
+    new_msgs = get_messages_since(current_user_id, other_user_id, state["last_id"])
+    if new_msgs:
+        state["msgs"] += [dict(m) for m in new_msgs]
+        state["last_id"] = new_msgs[-1]["id"]
+        state["idle"] = 0
+    else:
+        state["idle"] += 1
+    tier = min(state["idle"] // CHAT_IDLE_POLLS, len(CHAT_POLL_INTERVALS) - 1)
+    if tier != state["tier"]:
+        state["tier"] = tier
+        st.rerun()  # full rerun re-registers the fragment with the new interval
+    msgs = state["msgs"]
     # Container for chat messages
     with st.container(height=400, border=True):
         if not msgs: 
@@ -499,8 +2219,12 @@ def render_realtime_chat(current_user_id, other_user_id, current_user_name, othe
 # ----------------------------------------------------
 # MAIN APP EXECUTION
 # ----------------------------------------------------
-init_db()
+# set_page_config must be the first Streamlit call: a cold cache_resource shows a
+# spinner, which already counts as page output
 st.set_page_config(page_title="Sketchy Twitter", layout="wide", page_icon="📝")
+ensure_schema()
+get_metrics().begin(st.session_state.get("view"))
+get_wallet_pool()  # start filling the signup wallet pool before anyone signs up
 
 # CSS THEME - SKETCHY / WIREFRAME STYLE (LIGHT BLUE BUTTONS VERSION)
 # =========================================================
@@ -715,36 +2439,46 @@ st.markdown(
 # 1. Initialize with a specific key
 cookie_manager = stx.CookieManager(key="auth_mgr_production_v2")
 
-# 2. Add delay to allow the cookie component to mount on Streamlit Cloud
-time.sleep(0.5)
+# 2. Retrieve all cookies. CookieManager.get_all() defaults to {} and so can't tell "no
+#    cookies" from "not mounted yet"; asked with default=None, the component returns None
+#    until the browser has reported, and reruns the script by itself once it has.
+cookies = cookie_manager.cookie_manager(method="getAll", key="get_all", default=None)
+cookie_manager.cookies = cookies or {}
 
-# 3. Retrieve all cookies
-cookies = cookie_manager.get_all()
+# 3. Session Logic
+if "user" not in st.session_state:
+    st.session_state.user = None
 
-# 4. Strict Stop: If cookies is None, the component hasn't loaded yet.
-if cookies is None:
-    st.spinner("Loading Sketchy UI...")
+# 4. Strict Stop: only a rerun that still has to resolve the user needs the cookies
+if cookies is None and not st.session_state.user:
+    st.caption("Loading Sketchy UI...")
     st.stop()
 
-# 5. Extract User ID
-cookie_user_id = cookies.get("current_user_id")
-
-# 6. Session Logic
-if "user" not in st.session_state:
-    st.session_state.user = None
+# 5. Cookie writes are queued in session state and re-issued for a few reruns until the
+#    browser reports them, instead of sleeping before st.rerun() and hoping they landed
+cookie_token = sync_session_cookie(cookie_manager, cookies, st.session_state) if cookies is not None else None
+if cookies and LEGACY_COOKIE in cookies:
+    cookie_manager.delete(LEGACY_COOKIE, key="legacy_delete")
+
+# 6. Check Login: the signed token is validated once, then the user lives in session state
+if not st.session_state.user and cookie_token:
+    user_id = resolve_session(cookie_token)
+    user_data = get_user_by_id(user_id) if user_id else None
+    if user_data:
+        st.session_state.user = user_data
+        st.session_state.session_token = cookie_token
+        if "auth_mode" not in st.session_state: st.session_state.auth_mode = "home"
+    else:
+        st.session_state.revoked_token = cookie_token
+        st.session_state.pending_cookie = ("delete", cookie_token, 0)
+        st.warning("Session expired. Please log in again.")
 
-# 7. Check Login
-if not st.session_state.user and cookie_user_id:
-    try:
-        user_data = get_user_by_id(int(cookie_user_id))
-        if user_data:
-            st.session_state.user = user_data
-            if "auth_mode" not in st.session_state: st.session_state.auth_mode = "home"
-        else:
-            cookie_manager.delete("current_user_id")
-            st.warning("Session expired. Please log in again.")
-    except Exception as e:
-        cookie_manager.delete("current_user_id")
+# 7. One-shot messages set right before an st.rerun()
+flash = st.session_state.pop("flash", None)
+if flash:
+    msg, icon, balloons = flash
+    st.toast(msg, icon=icon)
+    if balloons: st.balloons()
 
 # ==========================================
 # AUTH SCREEN
@@ -766,11 +2500,14 @@ if not st.session_state.user:
                     if submitted:
                         row = authenticate(username.strip(), password)
                         if row:
+                            token = create_session(row['id'])
                             st.session_state.user = row
-                            cookie_manager.set("current_user_id", row['id'], expires_at=datetime.now() + timedelta(days=7))
-                            st.toast("Welcome back!", icon="👋")
-                            time.sleep(1) # Wait for cookie to write
+                            st.session_state.session_token = token
+                            st.session_state.pending_cookie = ("set", token, 0)
+                            st.session_state.flash = ("Welcome back!", "👋", False)
                             st.rerun()
+                        elif login_retry_after(username.strip()):
+                            st.error(f"Too many failed attempts. Try again in {int(login_retry_after(username.strip())) + 1}s.")
                         else:
                             st.error("Invalid username or password")
                 if st.button("Create an account", use_container_width=True):
@@ -790,20 +2527,18 @@ if not st.session_state.user:
                     if ok:
                         if not su_user or not su_name or not su_pass: st.error("Please fill required fields")
                         else:
-                            pic_path = None
-                            if su_pic:
-                                fname = f"{su_user}_{int(time.time()*1000)}_{su_pic.name}"
-                                path = os.path.join(PROFILE_PIC_DIR, fname)
-                                with open(path, "wb") as f: f.write(su_pic.getbuffer())
-                                pic_path = path
-                            with st.spinner("Generating Keys on Blockchain..."):
-                                new_id = create_user(su_user.strip(), su_name.strip(), su_pass, su_bio.strip(), pic_path)
-                            if new_id:
-                                st.success("Account created! Please log in.")
-                                time.sleep(1.5)
-                                st.session_state.auth_mode = "login"
-                                st.rerun()
-                            else: st.error("Username already exists")
+                            try:
+                                pic_path = save_upload(su_pic, PROFILE_PIC_DIR) if su_pic else None
+                            except UploadError as e:
+                                st.error(str(e))
+                            else:
+                                with st.spinner("Creating account..."):
+                                    new_id = create_user(su_user.strip(), su_name.strip(), su_pass, su_bio.strip(), pic_path)
+                                if new_id:
+                                    st.session_state.flash = ("Account created! Please log in.", "✅", False)
+                                    st.session_state.auth_mode = "login"
+                                    st.rerun()
+                                else: st.error("Username already exists")
                 if st.button("Back to Login", use_container_width=True):
                     st.session_state.auth_mode = "login"
                     st.rerun()
@@ -818,31 +2553,32 @@ with st.sidebar:
     # 1. THE X LOGO (Replaces Pencil)
     st.markdown("<h1 style='text-align: center; margin-bottom: 20px; font-size: 60px; font-family: sans-serif;'>𝕏</h1>", unsafe_allow_html=True)
     
+    usr = st.session_state.user
+    if usr:
+        usr = get_user_by_id(usr['id']) 
+        st.session_state.user = usr
+
     # 2. RENAMED BUTTONS (Matches Real Twitter)
-    if st.button("   Home", use_container_width=True): st.session_state.view = "home"; st.rerun()
-    if st.button("   Explore", use_container_width=True): st.session_state.view = "explore"; st.rerun()
-    if st.button("   Notifications", use_container_width=True): st.session_state.view = "notifications"; st.rerun()
-    if st.button("   Messages", use_container_width=True): st.session_state.view = "messages"; st.rerun()
-    if st.button("   Bookmarks", use_container_width=True): st.session_state.view = "bookmarks"; st.rerun()
-    if st.button("   Wallet", use_container_width=True): st.session_state.view = "wallet"; st.rerun()
-    if st.button("   Profile", use_container_width=True): st.session_state.view = f"profile:{st.session_state.user['username']}"; st.rerun()
+    if st.button("   Home", use_container_width=True): navigate("home")
+    if st.button("   Explore", use_container_width=True): navigate("explore")
+    # user row above is a cache read; the badge is one primary-key lookup
+    unread = get_unread_count(usr['id']) if usr and st.session_state.view != "notifications" else 0
+    if st.button(f"   Notifications ({unread})" if unread else "   Notifications", key="nav_notifications", use_container_width=True): navigate("notifications")
+    if st.button("   Messages", use_container_width=True): navigate("messages")
+    if st.button("   Bookmarks", use_container_width=True): navigate("bookmarks")
+    if st.button("   Wallet", use_container_width=True): navigate("wallet")
+    if st.button("   Profile", use_container_width=True): navigate(f"profile:{st.session_state.user['username']}")
     
     st.write("") 
-    if st.button("WRITE POST", type="primary", use_container_width=True): st.session_state.view = "create_post"; st.rerun()
+    if st.button("WRITE POST", type="primary", use_container_width=True): navigate("create_post")
     
     st.markdown("---")
     
-    usr = st.session_state.user
     if usr:
-        usr = get_user_by_id(usr['id']) 
-        st.session_state.user = usr
         with st.container():
             col_p1, col_p2 = st.columns([1, 3])
             with col_p1:
-                img_src = "https://cdn-icons-png.flaticon.com/512/149/149071.png"
-                if usr.get('profile_pic_path') and os.path.exists(usr['profile_pic_path']):
-                    b64 = get_image_base64(usr['profile_pic_path'])
-                    if b64: img_src = f"data:image/png;base64,{b64}"
+                img_src = media_url(usr.get('profile_pic_path'), "avatar", DEFAULT_AVATAR)
                 
                 # --- UPDATED: CLEAN CIRCLE (NO BORDER) ---
                 st.markdown(f"""
@@ -859,13 +2595,31 @@ with st.sidebar:
     st.markdown(f"<div style='background-color: #fff; color: #000; padding: 8px; border: 2px solid black; box-shadow: 2px 2px 0px black; font-family: monospace; text-align: center; font-size: 0.9em; margin-top: 5px;'>{short_addr}</div>", unsafe_allow_html=True)
     st.write("")
     if st.button("🚪 Logout", use_container_width=True):
+        token = st.session_state.get("session_token")
+        revoke_session(token)  # dead server-side even if the cookie lingers
         st.session_state.user = None
+        st.session_state.session_token = None
+        st.session_state.revoked_token = token
+        st.session_state.pending_cookie = ("delete", token, 0)
         st.session_state.auth_mode = "login"
         st.session_state.view = "home"
-        cookie_manager.delete("current_user_id")
-        time.sleep(1) 
         st.rerun()
 
+    if DEBUG_PANEL:
+        with st.expander("🛠 Debug"):
+            snap = metrics_snapshot()
+            last = snap["views"].get(st.session_state.view, {}).get("last")
+            if last:
+                st.caption(f"Last rerun here: {last['queries']} queries, {last['sql_ms']:.1f} ms SQL, {last['images']} image encodes ({last['image_ms']:.1f} ms), {last['wall_ms']:.0f} ms total")
+                if last["repeated"]:
+                    st.warning("Same statement repeated in one rerun (N+1?)")
+                    st.json(last["repeated"])
+            st.dataframe([{"view": v, "reruns": a["reruns"], "queries/rerun": round(a["queries"] / a["reruns"], 1), "SQL ms/rerun": round(a["sql_ms"] / a["reruns"], 1), "images": a["images"]} for v, a in snap["views"].items()], hide_index=True)
+            if snap["slow_queries"]:
+                st.write(f"Slow queries (≥ {SLOW_QUERY_MS} ms)")
+                st.json(snap["slow_queries"][-5:], expanded=False)
+            st.download_button("Export metrics (JSON)", json.dumps(snap, indent=2, default=str), file_name="metrics.json", mime="application/json")
+
 def render_user_list(title: str, user_list: List[sqlite3.Row]):
     st.header(title)
     if not user_list:
@@ -875,11 +2629,7 @@ def render_user_list(title: str, user_list: List[sqlite3.Row]):
         with st.container(border=True):
             cols = st.columns([1, 4, 2])
             with cols[0]:
-                img_src = "https://cdn-icons-png.flaticon.com/512/149/149071.png"
-                if u['profile_pic_path'] and os.path.exists(u['profile_pic_path']):
-                    b64 = get_image_base64(u['profile_pic_path'])
-                    if b64: img_src = f"data:image/png;base64,{b64}"
-                st.image(img_src, width=50)
+                st.image(media_file(u['profile_pic_path'], "avatar") or DEFAULT_AVATAR, width=50)
             with cols[1]:
                 st.write(f"**{u['display_name']}**")
                 st.caption(f"@{u['username']}")
@@ -889,24 +2639,29 @@ def render_user_list(title: str, user_list: List[sqlite3.Row]):
                     st.rerun()
 
 # --- VIEW HANDLERS ---
+# Loaded pages belong to the view they were loaded in; navigating (or re-clicking
+# the current view in the sidebar) starts fresh
+if st.session_state.get("paged_view") != st.session_state.view:
+    st.session_state.pages = {}
+    st.session_state.paged_view = st.session_state.view
+
 if st.session_state.view == "create_post":
     st.header("New Post")
     with st.container(border=True):
         with st.form("post_form"):
             text = st.text_area("What's on your mind?", max_chars=280)
-            img = st.file_uploader("Attach Image", type=["png","jpg","jpeg","gif"])
+            img = st.file_uploader("Attach Image", type=["png","jpg","jpeg","gif","webp"])
             ok = st.form_submit_button("PUBLISH", type="primary")
             if ok:
-                img_path = None
-                if img:
-                    fname = f"{int(time.time()*1000)}_{img.name}"
-                    path = os.path.join(POST_IMAGE_DIR, fname)
-                    with open(path, "wb") as f: f.write(img.getbuffer())
-                    img_path = path
-                create_post(st.session_state.user['id'], text, img_path)
-                st.success("Posted!")
-                st.session_state.view = "home"
-                st.rerun()
+                try:
+                    img_path = save_upload(img, POST_IMAGE_DIR) if img else None
+                except UploadError as e:
+                    st.error(str(e))
+                else:
+                    create_post(st.session_state.user['id'], text, img_path)
+                    st.success("Posted!")
+                    st.session_state.view = "home"
+                    st.rerun()
 
 elif st.session_state.view.startswith("reply:"):
     _, pid = st.session_state.view.split(":")
@@ -914,7 +2669,7 @@ elif st.session_state.view.startswith("reply:"):
     p = get_post(pid)
     if not p: st.error("Post not found")
     else:
-        render_post(p, "reply_view")
+        render_posts([p], "reply_view")
         with st.form("reply_form"):
             txt = st.text_area("Write a reply...", max_chars=280)
             ok = st.form_submit_button("REPLY", type="primary")
@@ -934,7 +2689,8 @@ elif st.session_state.view == "edit_profile":
             st.write("Profile Picture")
             col_preview, col_upload = st.columns([1, 3])
             with col_preview:
-                if curr.get('profile_pic_path') and os.path.exists(curr['profile_pic_path']): st.image(curr['profile_pic_path'], width=80)
+                curr_pic = media_file(curr.get('profile_pic_path'), "avatar_lg")
+                if curr_pic: st.image(curr_pic, width=80)
                 else: st.markdown("👤")
             with col_upload: new_pic = st.file_uploader("Upload new image", type=["png", "jpg", "jpeg"])
             st.write("")
@@ -942,31 +2698,30 @@ elif st.session_state.view == "edit_profile":
             if submitted:
                 if not new_name.strip(): st.error("Display Name cannot be empty")
                 else:
-                    final_path = None
-                    if new_pic:
-                        fname = f"updated_{curr['id']}_{int(time.time())}_{new_pic.name}"
-                        path = os.path.join(PROFILE_PIC_DIR, fname)
-                        with open(path, "wb") as f: f.write(new_pic.getbuffer())
-                        final_path = path
-                    updated_user = update_user_details(curr['id'], new_name.strip(), new_bio.strip(), final_path)
-                    st.session_state.user = updated_user
-                    st.success("Profile updated successfully!")
-                    time.sleep(1)
-                    st.session_state.view = f"profile:{curr['username']}"
-                    st.rerun()
+                    try:
+                        final_path = save_upload(new_pic, PROFILE_PIC_DIR) if new_pic else None
+                    except UploadError as e:
+                        st.error(str(e))
+                    else:
+                        updated_user = update_user_details(curr['id'], new_name.strip(), new_bio.strip(), final_path)
+                        st.session_state.user = updated_user
+                        st.session_state.flash = ("Profile updated successfully!", "✅", False)
+                        st.session_state.view = f"profile:{curr['username']}"
+                        st.rerun()
     if st.button("Cancel"):
         st.session_state.view = f"profile:{curr['username']}"
         st.rerun()
 
 elif st.session_state.view == "home":
     st.header("TODAY")
-    posts = get_feed(st.session_state.user['id'], limit=100)
-    if not posts: st.info("Timeline empty. Go to Explore!")
-    for p in posts: render_post(p, "home")
+    uid = st.session_state.user['id']
+    render_paged_posts("home", lambda before: get_feed(uid, PAGE_SIZE, before), "home", "Timeline empty. Go to Explore!")
 
 elif st.session_state.view == "explore":
     st.header("EXPLORE")
-    term = st.text_input("Search...", placeholder="Find users or posts...")
+    term = st.text_input("Search...", placeholder="Find users, posts or #topics...")
+    if HASHTAG_RE.fullmatch(term.strip()):
+        st.session_state.view = f"tag:{term.strip().lstrip('#').lower()}"; st.rerun()
     if term:
         st.subheader("Users")
         for u in search_users(term):
@@ -974,26 +2729,38 @@ elif st.session_state.view == "explore":
             if st.button("View", key=f"viewu:{u['id']}"):
                 st.session_state.view = f"profile:{u['username']}"; st.rerun()
         st.subheader("Posts")
-        for p in search_posts(term): render_post(p, "explore")
+        render_posts(search_posts(term), "explore")
     else:
+        trending = get_trending()
+        if trending:
+            st.subheader("Trending")
+            with st.container(border=True):
+                for t in trending:
+                    if st.button(f"#{t['tag']}", key=f"trend:{t['tag']}"):
+                        st.session_state.view = f"tag:{t['tag']}"; st.rerun()
         st.subheader("Recent Activity")
-        c = get_conn().cursor()
-        c.execute("SELECT p.*, u.username, u.display_name, u.profile_pic_path FROM posts p JOIN users u ON p.user_id = u.id ORDER BY p.created_at DESC LIMIT 100")
-        for p in c.fetchall(): render_post(p, "explore")
+        render_paged_posts("explore_recent", lambda before: get_recent_posts(PAGE_SIZE, before), "explore", "Nothing posted yet.")
 
 elif st.session_state.view == "bookmarks":
     st.header("SAVED")
-    bookmarks = get_bookmarks_for_user(st.session_state.user['id'])
-    if not bookmarks: st.info("No bookmarks yet.")
-    for p in bookmarks: render_post(p, "bookmarks")
+    uid = st.session_state.user['id']
+    render_paged_posts("bookmarks", lambda before: get_bookmarks_for_user(uid, PAGE_SIZE, before), "bookmarks", "No bookmarks yet.", ts_key="bookmarked_at")
 
 elif st.session_state.view == "notifications":
     st.header("ALERTS")
+    uid = st.session_state.user['id']
     with st.container(border=True):
-        notes = get_notifications(st.session_state.user['id'])
+        notes = paged_rows("notifications", lambda before: get_notifications(uid, PAGE_SIZE, before))
+        if notes:
+            # pull in only what arrived (or was re-coalesced) since the newest loaded row
+            fresh = [dict(n) for n in get_new_notifications(uid, notes[0]['created_at'])]
+            if fresh:
+                fresh_ids = {n['id'] for n in fresh}
+                notes[:] = fresh + [n for n in notes if n['id'] not in fresh_ids]
         if not notes: st.info("No notifications.")
-        for n in notes: st.write(f"**{human_time(n['created_at'])}** — {n['text']}")
-        mark_notifications_seen(st.session_state.user['id'])
+        for n in notes: st.write(f"**{human_time(n['created_at'])}** — {notification_text(n)}")
+        load_more_button("notifications")
+        mark_notifications_seen(uid)
 
 elif st.session_state.view == "messages":
     st.header("CHAT")
@@ -1011,15 +2778,20 @@ elif st.session_state.view == "messages":
             if ok and txt.strip():
                 send_message(user['id'], other_row['id'], txt)
                 st.toast("Message sent!")
+                # back to the fastest poll rate and show the message right away
+                chat = st.session_state.chats[(user['id'], other_row['id'])]
+                chat["idle"], chat["tier"] = 0, 0
+                st.rerun()
 
 elif st.session_state.view == "wallet":
     curr = st.session_state.user
     with st.spinner("Syncing with Blockchain..."):
         balance = get_sui_balance(curr['wallet_address'])
-        sui_price, price_change_pct = get_sui_market_data()
+        sui_price, price_change_pct, price_age = get_price_feed().latest()
     holdings_value = balance * sui_price
     change_color = "#00ba7c" if price_change_pct >= 0 else "#f91880"
     change_sign = "+" if price_change_pct >= 0 else ""
+    price_note = f"price updated {int(price_age)}s ago" if price_age is not None else "price feed connecting…"
 
     st.header("WALLET")
     st.markdown(f"""
@@ -1030,6 +2802,7 @@ elif st.session_state.view == "wallet":
                 <div>
                     <div style="font-weight: 800; font-size: 19px; color: black; display: flex; align-items: center; gap: 4px;">SUI COIN</div>
                     <div style="font-size: 15px; color: #555; margin-top: 2px;">${sui_price:,.2f} <span style="color: {change_color}; font-weight: 900;">{change_sign}{price_change_pct:.2f}%</span></div>
+                    <div style="font-size: 12px; color: #888; margin-top: 2px;">{price_note}</div>
                 </div>
             </div>
             <div style="text-align: right;">
@@ -1050,27 +2823,25 @@ elif st.session_state.view == "wallet":
                 elif not dest_addr.startswith("0x"): st.error("Invalid SUI address.")
                 else:
                     with st.spinner("Processing on Blockchain..."):
-                        success, msg = send_sui_payment(curr['private_key'], dest_addr, amount)
+                        success, msg = send_sui_payment(get_wallet_keys(curr['id'])[0], dest_addr, amount)
                         if success:
-                            st.success(f"Transaction Sent! Digest: {msg}")
-                            st.balloons()
-                            time.sleep(2)
+                            st.session_state.flash = (f"Transaction Sent! Digest: {msg}", "✅", True)
                             st.rerun()
                         else: st.error(f"Failed: {msg}")
     st.divider()
     with st.expander("🔐 View Keys"):
         st.warning("These are your keys. Never share them.")
-        st.text_input("Private Key", curr['private_key'], type="password", disabled=True)
-        st.text_area("Mnemonic Phrase", curr['mnemonic'], disabled=True)
+        private_key, mnemonic = get_wallet_keys(curr['id'])
+        st.text_input("Private Key", private_key, type="password", disabled=True)
+        st.text_area("Mnemonic Phrase", mnemonic, disabled=True)
 
 elif st.session_state.view.startswith("profile:"):
     _, uname = st.session_state.view.split(":")
-    u_row = get_user_by_username(uname)
-    if not u_row: st.error("User not found")
+    current_user_id = st.session_state.user['id']
+    u = get_profile(uname, current_user_id)
+    if not u: st.error("User not found")
     else:
-        u = dict(u_row)
         user_id = u['id']
-        current_user_id = st.session_state.user['id']
         is_me = (current_user_id == user_id)
         
         # Main Profile Card
@@ -1080,10 +2851,7 @@ elif st.session_state.view.startswith("profile:"):
             
             # --- COLUMN 1: AVATAR ---
             with header_cols[0]:
-                img_src = "https://cdn-icons-png.flaticon.com/512/149/149071.png"
-                if u.get('profile_pic_path') and os.path.exists(u['profile_pic_path']):
-                    b64 = get_image_base64(u['profile_pic_path'])
-                    if b64: img_src = f"data:image/png;base64,{b64}"
+                img_src = media_url(u.get('profile_pic_path'), "avatar_lg", DEFAULT_AVATAR)
                 
                 # CSS: Added box-shadow to mask jagged edges and ensure a clean circle
                 st.markdown(f"""
@@ -1119,27 +2887,26 @@ elif st.session_state.view.startswith("profile:"):
                 st.markdown(f"""<div style="color: #666; font-size: 0.9rem; margin-top: 8px; margin-bottom: 10px;">📅 Joined {human_time(u.get('created_at')).split(' ')[0]}</div>""", unsafe_allow_html=True)
                 
                 # 4. Stats (Following / Followers) - Nested columns to keep them tight
-                stat_row = st.columns([1.2, 1.2, 3])
+                stat_row = st.columns([1.2, 1.2, 1, 2])
                 with stat_row[0]:
-                    if st.button(f"{get_following_count(user_id)} Following", key=f"ing_{user_id}"): 
+                    if st.button(f"{u['following_count']} Following", key=f"ing_{user_id}"): 
                         st.session_state.view = f"following_list:{user_id}:{uname}"
                         st.rerun()
                 with stat_row[1]:
-                    if st.button(f"{get_follower_count(user_id)} Followers", key=f"ers_{user_id}"): 
+                    if st.button(f"{u['follower_count']} Followers", key=f"ers_{user_id}"): 
                         st.session_state.view = f"followers_list:{user_id}:{uname}"
                         st.rerun()
+                with stat_row[2]:
+                    st.markdown(f"<div style='color: #555; padding-top: 8px;'>{u['post_count']} Posts</div>", unsafe_allow_html=True)
 
                 # 5. "Followed By" Section (Clickable Buttons + Bigger Text)
                 if not is_me:
-                    mutuals = get_common_followers(current_user_id, user_id)
+                    mutuals = u['mutuals']
                     if mutuals:
                         # 1. Prepare Avatar HTML
                         avatar_html = ""
                         for m in mutuals:
-                            m_src = "https://cdn-icons-png.flaticon.com/512/149/149071.png"
-                            if m['profile_pic_path'] and os.path.exists(m['profile_pic_path']):
-                                b64 = get_image_base64(m['profile_pic_path'])
-                                if b64: m_src = f"data:image/png;base64,{b64}"
+                            m_src = media_url(m['profile_pic_path'], "avatar", DEFAULT_AVATAR)
                             avatar_html += f"""<img src="{m_src}" style="width: 24px; height: 24px; border-radius: 50%; border: 1px solid white; margin-right: -8px;">"""
                         
                         # 2. Render Layout using Columns to allow Buttons
@@ -1182,7 +2949,7 @@ elif st.session_state.view.startswith("profile:"):
             # --- COLUMN 3: EDIT / FOLLOW BUTTON ---
             with header_cols[2]:
                 if not is_me:
-                    if is_following(st.session_state.user['id'], user_id):
+                    if u['is_following']:
                         if st.button("Unfollow", key=f"unfol_{user_id}", use_container_width=True): 
                             unfollow_user(st.session_state.user['id'], user_id)
                             st.rerun()
@@ -1197,7 +2964,7 @@ elif st.session_state.view.startswith("profile:"):
                         tip_val = st.number_input("Amount", 0.1, step=0.1, key=f"tip_{user_id}")
                         if st.button("Send Tip", key=f"pay_{user_id}"):
                             with st.spinner("..."):
-                                s, m = send_sui_payment(st.session_state.user['private_key'], u['wallet_address'], tip_val)
+                                s, m = send_sui_payment(get_wallet_keys(current_user_id)[0], u['wallet_address'], tip_val)
                                 if s: st.success("Sent!"); create_notification(user_id, f"Tip from @{st.session_state.user['username']}")
                                 else: st.error(m)
                 else:
@@ -1207,16 +2974,17 @@ elif st.session_state.view.startswith("profile:"):
 
         st.markdown("---")
 
-        # TABS
-        tab_posts, tab_replies, tab_likes = st.tabs(["POSTS", "REPLIES", "LIKES"])
-        with tab_posts:
-            user_posts = get_posts_for_user(user_id, limit=100)
-            if not user_posts: st.info("No posts yet.")
-            for p in user_posts: render_post(p, "prof_posts")
-        with tab_replies:
-            replies_list = get_replies_for_user(user_id)
+        # TABS (only the selected one is queried)
+        tab = st.radio("Profile tab", PROFILE_TABS, horizontal=True, key=f"prof_tab:{user_id}", label_visibility="collapsed")
+        if tab == "POSTS":
+            render_paged_posts(f"prof_posts:{user_id}", lambda before: get_posts_for_user(user_id, PAGE_SIZE, before), "prof_posts", "No posts yet.")
+        elif tab == "REPLIES":
+            replies_key = f"prof_replies:{user_id}"
+            replies_list = paged_rows(replies_key, lambda before: get_replies_for_user(user_id, PAGE_SIZE, before), "reply_created_at", "reply_id")
             if not replies_list: st.info("No replies yet.")
-            for r in replies_list:
+            ctx_rows = [{ "id": r["orig_post_id"], "username": r["orig_username"], "display_name": r["orig_display"], "profile_pic_path": r["orig_pic"], "text": r["orig_text"], "image_path": r["orig_image"], "created_at": r["orig_created"] } for r in replies_list]
+            ctx_posts = hydrate_posts(ctx_rows, current_user_id)
+            for r, ctx_post in zip(replies_list, ctx_posts):
                 with st.container(border=True):
                     col_icon, col_txt = st.columns([1, 20])
                     with col_icon: st.write("💬")
@@ -1224,13 +2992,17 @@ elif st.session_state.view.startswith("profile:"):
                         st.caption(f"Replying to @{r['orig_username']}")
                         st.markdown(f"**{r['reply_text']}**")
                         with st.expander("Original Post Context"):
-                            fake_post_row = { "id": r["orig_post_id"], "username": r["orig_username"], "display_name": r["orig_display"], "profile_pic_path": r["orig_pic"], "text": r["orig_text"], "image_path": r["orig_image"], "created_at": r["orig_created"] }
-                            render_post(fake_post_row, key_prefix=f"reply_ctx_{r['reply_id']}")
-        with tab_likes:
-             liked_posts = get_liked_posts_for_user(user_id)
-             if not liked_posts: st.info("No liked posts yet.")
-             for p in liked_posts: render_post(p, "prof_likes")
+                            render_post(ctx_post, key_prefix=f"reply_ctx_{r['reply_id']}")
+            load_more_button(replies_key)
+        else:
+            render_paged_posts(f"prof_likes:{user_id}", lambda before: get_liked_posts_for_user(user_id, PAGE_SIZE, before), "prof_likes", "No liked posts yet.", ts_key="liked_at")
+
 
+elif st.session_state.view.startswith("tag:"):
+    _, tag = st.session_state.view.split(":", 1)
+    st.header(f"#{tag}")
+    if st.button("← Explore"): st.session_state.view = "explore"; st.rerun()
+    render_paged_posts(f"tag:{tag}", lambda before: get_posts_for_tag(tag, PAGE_SIZE, before), "tag", "No posts with this tag yet.")
 
 elif st.session_state.view.startswith("following_list:"):
     _, user_id_str, uname = st.session_state.view.split(":")
@@ -1244,3 +3016,4 @@ elif st.session_state.view.startswith("followers_list:"):
 
 else: st.write("Unknown view")
 st.markdown("---")
+get_metrics().end(st.session_state.get("view"))
@@ -0,0 +1,72 @@
+"""Offline load benchmarks for the app.py data API.
+
+app.py is a Streamlit script, so importing it would run the UI. load_app()
+instead executes it up to the "# MAIN APP EXECUTION" marker, which defines
+the whole data layer without rendering anything, then swaps the wallet /
+market-data calls for local stubs so nothing touches the network.
+
+    python -m bench --scales small,medium --out bench.json
+    python -m bench.login --costs 12,14,15
+"""
+import os
+import secrets
+import sqlite3
+import threading
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+MAIN_MARKER = "# MAIN APP EXECUTION"
+
+
+def _stub_wallet() -> tuple:
+    return "0x" + secrets.token_hex(32), "bench-key-" + secrets.token_hex(8), "bench mnemonic"
+
+
+def stub_wallet_calls(ns: dict):
+    """Replaces every pysui / HTTP call the data API can reach with an offline stub."""
+    ns["generate_new_wallet"] = _stub_wallet
+    ns["get_sui_balance"] = lambda address, use_cache=True: 0.0
+    ns["get_sui_balances"] = lambda addresses, **kw: {a: 0.0 for a in addresses}
+    ns["send_sui_payment"] = lambda *a, **kw: (False, "wallet calls are stubbed in benchmarks")
+    ns["get_sui_market_data"] = lambda: ns["FALLBACK_PRICE"]
+    pool = ns["WalletPool"](size=1, workers=1, generate=_stub_wallet)
+    ns["get_wallet_pool"] = lambda: pool
+
+
+def load_app(workdir: str, stub_network: bool = True) -> dict:
+    """Executes app.py's data layer with its relative paths (DB, uploads) rooted at `workdir`.
+
+    With stub_network=False the real wallet / RPC functions are kept, for
+    callers that point them at their own local servers."""
+    with open(APP_PATH, encoding="utf-8") as f:
+        src = f.read()
+    head, sep, _ = src.partition(MAIN_MARKER)
+    if not sep:
+        raise RuntimeError(f"{APP_PATH} has no {MAIN_MARKER!r} marker")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    ns = {"__name__": "app_bench", "__file__": APP_PATH}
+    exec(compile(head, APP_PATH, "exec"), ns)
+    if stub_network: stub_wallet_calls(ns)
+    return ns
+
+
+def percentile(samples, q: float) -> float:
+    """Nearest-rank percentile of `samples`."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+class QueryCounter:
+    """Counts SQL statements (trigger bodies excluded) on the connections it's attached to."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, statement: str):
+        if statement.startswith("--"): return  # "-- TRIGGER name" lines
+        with self._lock:
+            self.count += 1
+
+    def attach(self, conn: sqlite3.Connection):
+        conn.set_trace_callback(self)
@@ -0,0 +1,152 @@
+"""Seeds a database per scale, times each data-API call and prints a JSON report.
+
+    python -m bench --scales small,medium --iterations 200 --out bench.json
+
+Each case reports p50/p95/p99/mean latency in milliseconds and the mean
+number of SQL statements per call, so runs can be diffed over time.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import sys
+import time
+
+from . import QueryCounter, load_app, percentile
+from .seed import SCALES, TAGS, WORDS, seed
+
+
+def _user(rng, ctx) -> int:
+    return rng.randint(1, ctx["users"])
+
+
+def _feed_page2(ns, rng, ctx):
+    viewer = _user(rng, ctx)
+    first = ns["get_feed"](viewer)
+    cursor = ns["page_cursor"](first, ns["PAGE_SIZE"])
+    return ns["get_feed"](viewer, before=cursor) if cursor else first
+
+
+def _chat_pair(ns, rng, ctx):
+    return ctx["pairs"][rng.randrange(len(ctx["pairs"]))]
+
+
+def _render_feed(ns, rng, ctx):
+    viewer = _user(rng, ctx)
+    for p in ns["hydrate_posts"](ns["get_feed"](viewer), viewer):
+        ns["render_post"](p, key_prefix=f"bench_{rng.random()}")
+
+
+# name -> fn(ns, rng, ctx); reads first, then the write paths
+CASES = {
+    "get_feed": lambda ns, rng, ctx: ns["get_feed"](_user(rng, ctx)),
+    "get_feed_page2": _feed_page2,
+    "get_recent_posts": lambda ns, rng, ctx: ns["get_recent_posts"](),
+    "get_posts_for_user": lambda ns, rng, ctx: ns["get_posts_for_user"](_user(rng, ctx)),
+    "get_profile": lambda ns, rng, ctx: ns["get_profile"](f"user{_user(rng, ctx) - 1}", _user(rng, ctx)),
+    "get_user_by_id": lambda ns, rng, ctx: ns["get_user_by_id"](_user(rng, ctx)),
+    "search_posts": lambda ns, rng, ctx: ns["search_posts"](rng.choice(WORDS)),
+    "search_users": lambda ns, rng, ctx: ns["search_users"](f"user{rng.randrange(100)}"),
+    "get_posts_for_tag": lambda ns, rng, ctx: ns["get_posts_for_tag"](rng.choice(TAGS[:20])),
+    "get_trending": lambda ns, rng, ctx: ns["get_trending"](),
+    "get_messages_between": lambda ns, rng, ctx: ns["get_messages_between"](*_chat_pair(ns, rng, ctx)),
+    "get_messages_since": lambda ns, rng, ctx: ns["get_messages_since"](*_chat_pair(ns, rng, ctx), ctx["last_message"] - 50),
+    "get_notifications": lambda ns, rng, ctx: ns["get_notifications"](_user(rng, ctx)),
+    "hydrate_posts": lambda ns, rng, ctx: ns["hydrate_posts"](ns["get_recent_posts"](), _user(rng, ctx)),
+    "render_post": _render_feed,
+    "like_post": lambda ns, rng, ctx: ns["like_post"](_user(rng, ctx), rng.randint(1, ctx["posts"])),
+    "create_post": lambda ns, rng, ctx: ns["create_post"](_user(rng, ctx), f"bench {rng.choice(WORDS)} #{rng.choice(TAGS)}"),
+    "send_message": lambda ns, rng, ctx: ns["send_message"](*_chat_pair(ns, rng, ctx), "bench"),
+    "create_user": lambda ns, rng, ctx: ns["create_user"](f"bench_{time.time_ns()}", "Bench", "pw"),
+    "authenticate": lambda ns, rng, ctx: ns["authenticate"](f"user{_user(rng, ctx) - 1}", "bench"),
+}
+
+
+def run_case(ns, fn, iterations: int, rng, ctx, counter: QueryCounter) -> dict:
+    times, queries = [], 0
+    for _ in range(iterations):
+        before = counter.count
+        t = time.perf_counter()
+        fn(ns, rng, ctx)
+        times.append((time.perf_counter() - t) * 1000)
+        queries += counter.count - before
+    return {
+        "n": iterations,
+        "p50_ms": round(percentile(times, 50), 3),
+        "p95_ms": round(percentile(times, 95), 3),
+        "p99_ms": round(percentile(times, 99), 3),
+        "mean_ms": round(sum(times) / len(times), 3),
+        "queries_per_call": round(queries / iterations, 2),
+    }
+
+
+def run_scale(scale: str, workdir: str, iterations: int, cases, rng_seed: int, reseed: bool) -> dict:
+    ns = load_app(os.path.join(workdir, scale))
+    db = ns["DB_PATH"]  # relative to the scale directory load_app moved into
+    if reseed:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db + suffix): os.remove(db + suffix)
+    fresh = not os.path.exists(db)
+    report = seed(ns, scale, rng_seed) if fresh else {"rows": None, "seed_seconds": 0}
+    ns["init_db"]()
+    conn = sqlite3.connect(ns["DB_PATH"])
+    ctx = {
+        "users": conn.execute("SELECT MAX(id) FROM users").fetchone()[0],
+        "posts": conn.execute("SELECT MAX(id) FROM posts").fetchone()[0],
+        "last_message": conn.execute("SELECT MAX(id) FROM messages").fetchone()[0] or 0,
+        "pairs": conn.execute("SELECT sender_id, receiver_id FROM messages GROUP BY sender_id, receiver_id ORDER BY COUNT(*) DESC LIMIT 1000").fetchall(),
+    }
+    conn.close()
+    counter = QueryCounter()
+    counter.attach(ns["get_conn"]())
+    counter.attach(ns["get_writer"]()._conn)
+    rng = random.Random(rng_seed)
+    report["cases"] = {}
+    for name in cases:
+        try:
+            report["cases"][name] = run_case(ns, CASES[name], iterations, rng, ctx, counter)
+        except Exception as e:
+            report["cases"][name] = {"error": f"{type(e).__name__}: {e}"}
+        ns["get_notification_queue"]().flush()
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="small", help=f"comma-separated, from: {', '.join(SCALES)}")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated subset of cases")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=".bench", help="databases are kept here per scale and reused")
+    parser.add_argument("--reseed", action="store_true", help="rebuild the databases even if they exist")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    scales = [s for s in args.scales.split(",") if s]
+    cases = [c for c in args.cases.split(",") if c]
+    unknown = [s for s in scales if s not in SCALES] + [c for c in cases if c not in CASES]
+    if unknown: parser.error(f"unknown scale/case: {', '.join(unknown)}")
+    logging.getLogger("streamlit").setLevel(logging.ERROR)  # bare-mode warnings from render_post
+
+    workdir, cwd = os.path.abspath(args.workdir), os.getcwd()
+    result = {
+        "meta": {"started_at": time.time(), "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                 "iterations": args.iterations, "seed": args.seed},
+        "scales": {},
+    }
+    for scale in scales:
+        result["scales"][scale] = run_scale(scale, workdir, args.iterations, cases, args.seed, args.reseed)
+        os.chdir(cwd)
+    out = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: f.write(out + "\n")
+    else:
+        print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
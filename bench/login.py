@@ -0,0 +1,90 @@
+"""Login throughput (authenticate() end to end) at one or more scrypt costs.
+
+    python -m bench.login --costs 12,14,15 --threads 16 --seconds 5
+
+For each log2(n) cost, hashes are created at that cost, the app is pointed at
+it (so nothing gets rehashed) and `threads` clients log in for `seconds`.
+Reports logins/sec and latency percentiles as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import load_app, percentile
+
+USERS = 50
+
+
+def run_cost(ns: dict, cost: int, threads: int, seconds: float, workers: int) -> dict:
+    n = 2 ** cost
+    ns["PASSWORD_SCRYPT_N"] = n
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kdf")
+    ns["get_password_pool"] = lambda: pool
+    started = time.perf_counter()
+    hashed = ns["hash_password"]("bench", n=n)
+    hash_ms = (time.perf_counter() - started) * 1000
+    ns["run_write"](lambda c: c.executemany(
+        "INSERT INTO users (username, display_name, password_hash, created_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(username) DO UPDATE SET password_hash = excluded.password_hash",
+        [(f"login{i}", "Login", hashed, time.time()) for i in range(USERS)]))
+
+    latencies, lock, stop = [], threading.Lock(), threading.Event()
+    def client(k: int):
+        mine, i = [], k
+        while not stop.is_set():
+            t = time.perf_counter()
+            if ns["authenticate"](f"login{i % USERS}", "bench") is None:
+                raise RuntimeError("benchmark login failed")
+            mine.append((time.perf_counter() - t) * 1000)
+            i += threads
+        with lock: latencies.extend(mine)
+    clients = [threading.Thread(target=client, args=(k,)) for k in range(threads)]
+    t0 = time.perf_counter()
+    for c in clients: c.start()
+    time.sleep(seconds)
+    stop.set()
+    for c in clients: c.join()
+    elapsed = time.perf_counter() - t0
+    pool.shutdown()
+    return {
+        "n": n, "r": ns["PASSWORD_SCRYPT_R"], "p": ns["PASSWORD_SCRYPT_P"], "kdf_workers": workers,
+        "single_hash_ms": round(hash_ms, 2),
+        "logins": len(latencies),
+        "logins_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.login", description=__doc__.splitlines()[0])
+    parser.add_argument("--costs", default="14", help="comma-separated log2(n) values, e.g. 12,14,15")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent login clients")
+    parser.add_argument("--workers", type=int, help="KDF pool size (default: the app's PASSWORD_WORKERS)")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--workdir", default=".bench")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    cwd = os.getcwd()
+    ns = load_app(os.path.join(os.path.abspath(args.workdir), "login"))
+    ns["init_db"]()
+    workers = args.workers or ns["PASSWORD_WORKERS"]
+    result = {"meta": {"started_at": time.time(), "threads": args.threads, "seconds": args.seconds, "cpus": os.cpu_count()},
+              "costs": [run_cost(ns, int(c), args.threads, args.seconds, workers) for c in args.costs.split(",") if c]}
+    os.chdir(cwd)
+    out = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: f.write(out + "\n")
+    else:
+        print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
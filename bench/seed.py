@@ -0,0 +1,137 @@
+"""Synthetic data for the benchmarks: power-law follow graph, posts, likes, replies, messages."""
+import bisect
+import random
+import sqlite3
+import time
+from itertools import accumulate
+
+SCALES = {
+    "small": {"users": 1_000, "posts": 20_000, "likes": 50_000, "replies": 10_000, "messages": 10_000},
+    "medium": {"users": 10_000, "posts": 200_000, "likes": 500_000, "replies": 100_000, "messages": 100_000},
+    "large": {"users": 100_000, "posts": 2_000_000, "likes": 5_000_000, "replies": 1_000_000, "messages": 1_000_000},
+    "xl": {"users": 100_000, "posts": 10_000_000, "likes": 20_000_000, "replies": 4_000_000, "messages": 4_000_000},
+}
+FOLLOWS_MEAN = 20  # average accounts followed per user (out-degree is Pareto distributed)
+ZIPF_EXPONENT = 1.1  # popularity skew for followed accounts, active posters and liked posts
+HISTORY_DAYS = 30
+CHUNK = 10_000
+
+WORDS = ("sui", "wallet", "coffee", "morning", "build", "ship", "bug", "deploy", "python", "sqlite",
+         "streamlit", "music", "game", "weekend", "market", "pump", "dump", "moon", "chart", "art",
+         "design", "sketch", "photo", "cat", "dog", "food", "travel", "rain", "sun", "code", "review",
+         "launch", "token", "nft", "stake", "validator", "gas", "block", "chain", "meme")
+TAGS = tuple(f"tag{i}" for i in range(200))
+
+
+class Zipf:
+    """Draws indexes 0..n-1 with probability proportional to 1 / (rank + 1) ** s."""
+
+    def __init__(self, n: int, s: float = ZIPF_EXPONENT, rng: random.Random = random):
+        self.n = n
+        self.rng = rng
+        self.cum = list(accumulate(1.0 / (r + 1) ** s for r in range(n)))
+
+    def draw(self) -> int:
+        return bisect.bisect_left(self.cum, self.rng.random() * self.cum[-1])
+
+
+def _text(rng: random.Random, words: Zipf, users: int) -> str:
+    text = " ".join(WORDS[words.draw()] for _ in range(rng.randint(4, 16)))
+    if rng.random() < 0.15: text += f" #{TAGS[min(int(rng.paretovariate(1.2)) - 1, len(TAGS) - 1)]}"
+    if rng.random() < 0.05: text += f" @user{rng.randrange(users)}"
+    return text
+
+
+def _insert(conn: sqlite3.Connection, sql: str, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK:
+            conn.executemany(sql, batch)
+            batch.clear()
+    if batch: conn.executemany(sql, batch)
+
+
+def seed(ns: dict, scale: str, seed: int = 0) -> dict:
+    """Fills the app's (fresh) database at `scale`; returns row counts and timing."""
+    counts = SCALES[scale]
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    ns["init_db"]()
+    conn = sqlite3.connect(ns["DB_PATH"])
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous = OFF")
+    n_users, n_posts = counts["users"], counts["posts"]
+    now = time.time()
+    t0 = now - HISTORY_DAYS * 86400
+    pw = ns["hash_password"]("bench")
+
+    # rank 0 is the most followed account; shuffle so popularity isn't tied to user id
+    popular = list(range(1, n_users + 1))
+    rng.shuffle(popular)
+    _insert(conn, "INSERT INTO users (id, username, display_name, password_hash, bio, created_at, wallet_address, private_key, mnemonic) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((i, f"user{i - 1}", f"User {i - 1}", pw, "bench user", t0, f"0x{i:064x}", "", "") for i in range(1, n_users + 1)))
+
+    followed = Zipf(n_users, rng=rng)
+    def follows():
+        for follower in range(1, n_users + 1):
+            k = min(int(rng.paretovariate(1.5) * FOLLOWS_MEAN / 3), n_users - 1)
+            for target in {popular[followed.draw()] for _ in range(k)} - {follower}:
+                yield follower, target, t0
+    _insert(conn, "INSERT OR IGNORE INTO follows (follower_id, followed_id, created_at) VALUES (?, ?, ?)", follows())
+
+    # posts in time order so ids and created_at agree; hashtags/mentions go through the app's indexer
+    # posting activity is skewed too, but independently of follower popularity
+    active = popular[:]
+    rng.shuffle(active)
+    words, posters = Zipf(len(WORDS), rng=rng), Zipf(n_users, rng=rng)
+    index_terms = ns["index_terms"]
+    c = conn.cursor()
+    step = (now - t0) / n_posts
+    def posts():
+        for pid in range(1, n_posts + 1):
+            author, created, text = active[posters.draw()], t0 + pid * step, _text(rng, words, n_users)
+            if "#" in text or "@" in text: index_terms(c, text, author, pid, created)
+            yield pid, author, text, created
+    _insert(conn, "INSERT INTO posts (id, user_id, text, created_at) VALUES (?, ?, ?, ?)", posts())
+
+    hot = Zipf(n_posts, rng=rng)  # rank 0 = newest post
+    _insert(conn, "INSERT OR IGNORE INTO likes (user_id, post_id, created_at) VALUES (?, ?, ?)",
+            ((rng.randint(1, n_users), n_posts - hot.draw(), now - rng.random() * 86400) for _ in range(counts["likes"])))
+    def replies():
+        for rid in range(1, counts["replies"] + 1):
+            pid = n_posts - hot.draw()
+            yield rid, pid, rng.randint(1, n_users), _text(rng, words, n_users), t0 + pid * step + rng.random() * 3600
+    _insert(conn, "INSERT INTO replies (id, post_id, user_id, text, created_at) VALUES (?, ?, ?, ?, ?)", replies())
+    # reply notifications for post owners; older ones already seen
+    conn.execute("""
+        INSERT OR IGNORE INTO notifications (user_id, text, seen, created_at, kind, target_id, actor, actor_count)
+        SELECT p.user_id, '@' || u.username || ' replied to your post', r.created_at < ?, r.created_at, 'reply', p.id, u.username, 1
+        FROM replies r JOIN posts p ON p.id = r.post_id JOIN users u ON u.id = r.user_id ORDER BY r.created_at
+    """, (now - 86400,))
+    conn.execute("INSERT OR IGNORE INTO notification_actors (notification_id, actor_id) SELECT n.id, u.id FROM notifications n JOIN users u ON u.username = n.actor WHERE n.seen = 0")
+
+    # a few conversations per user, chattiest pairs first
+    pairs = [(rng.randint(1, n_users), rng.randint(1, n_users)) for _ in range(n_users * 3)]
+    pairs = [p for p in pairs if p[0] != p[1]]
+    chatty = Zipf(len(pairs), rng=rng)
+    def messages():
+        for mid in range(1, counts["messages"] + 1):
+            a, b = pairs[chatty.draw()]
+            if rng.random() < 0.5: a, b = b, a
+            yield mid, a, b, _text(rng, words, n_users), t0 + mid * (now - t0) / counts["messages"]
+    _insert(conn, "INSERT INTO messages (id, sender_id, receiver_id, text, created_at) VALUES (?, ?, ?, ?, ?)", messages())
+
+    # materialized timelines, as fan-out-on-write would have left them
+    conn.execute("INSERT OR IGNORE INTO timeline (user_id, created_at, post_id, author_id) SELECT user_id, created_at, id, user_id FROM posts")
+    conn.execute("""
+        INSERT OR IGNORE INTO timeline (user_id, created_at, post_id, author_id)
+        SELECT f.follower_id, p.created_at, p.id, p.user_id FROM users a
+        JOIN follows f ON f.followed_id = a.id JOIN posts p ON p.user_id = a.id
+        WHERE a.follower_count < ?
+    """, (ns["TIMELINE_FANOUT_LIMIT"],))
+    conn.commit()
+    rows = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+            for t in ("users", "follows", "posts", "likes", "replies", "messages", "notifications", "timeline", "hashtags")}
+    conn.close()
+    return {"rows": rows, "seed_seconds": round(time.perf_counter() - started, 2)}
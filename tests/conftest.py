@@ -0,0 +1,57 @@
+"""Fixtures that load app.py's data layer (see bench.load_app) into a temp directory."""
+import pytest
+
+from bench import load_app
+
+
+def _load(workdir, monkeypatch, stub_network: bool = True) -> dict:
+    st = pytest.importorskip("streamlit")
+    pytest.importorskip("pysui")
+    # st.cache_resource keys on function source, so every load would share the first one's pools
+    st.cache_resource.clear()
+    monkeypatch.chdir(workdir)
+    return load_app(str(workdir), stub_network)
+
+
+def _clear_resources():
+    import streamlit
+    streamlit.cache_resource.clear()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch) -> dict:
+    """A fresh app namespace with an empty, migrated database."""
+    ns = _load(tmp_path, monkeypatch)
+    ns["init_db"]()
+    yield ns
+    _clear_resources()
+
+
+@pytest.fixture
+def users(app) -> list:
+    """Ids of five plain users, @u1 … @u5, in the `app` database."""
+    app["run_write"](lambda c: c.executemany(
+        "INSERT INTO users (username, display_name, password_hash, created_at) VALUES (?, ?, 'x', 0)",
+        [(f"u{i}", f"U{i}") for i in range(1, 6)]))
+    return [1, 2, 3, 4, 5]
+
+
+@pytest.fixture
+def live_app(tmp_path, monkeypatch) -> dict:
+    """Like `app`, but keeps the real wallet / RPC functions; tests aim them at local servers."""
+    ns = _load(tmp_path, monkeypatch, stub_network=False)
+    ns["init_db"]()
+    yield ns
+    _clear_resources()
+
+
+@pytest.fixture(scope="module")
+def seeded_app(tmp_path_factory) -> dict:
+    """An app namespace over the benchmark's "small" synthetic dataset, shared by a module."""
+    from bench.seed import seed
+    mp = pytest.MonkeyPatch()
+    ns = _load(tmp_path_factory.mktemp("seeded"), mp)
+    seed(ns, "small")
+    yield ns
+    _clear_resources()
+    mp.undo()
@@ -0,0 +1,14 @@
+"""Runs the whole script headless with Streamlit's AppTest."""
+import pytest
+
+from bench import APP_PATH
+
+
+def test_first_run_renders_without_exceptions(tmp_path, monkeypatch):
+    testing = pytest.importorskip("streamlit.testing.v1")
+    pytest.importorskip("pysui")
+    pytest.importorskip("extra_streamlit_components")
+    monkeypatch.chdir(tmp_path)
+    at = testing.AppTest.from_file(APP_PATH, default_timeout=60).run()
+    # e.g. set_page_config after a cold cache_resource spinner raises StreamlitAPIException
+    assert not at.exception
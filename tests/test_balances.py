@@ -0,0 +1,150 @@
+"""get_sui_balances() against a local JSON-RPC stub standing in for the Sui node."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+MIST = 1_000_000_000
+
+
+def address(i: int) -> str:
+    return f"0x{i:064x}"
+
+
+def balance_of(addr: str) -> int:
+    return int(addr, 16) * MIST
+
+
+class StubRPC(ThreadingHTTPServer):
+    """Answers suix_getBalance batches; records batch sizes and peak concurrency."""
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.0, failing=()):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.delay = delay
+        self.failing = set(failing)  # a batch containing one of these gets an HTTP 500
+        self.batches = []
+        self.in_flight = self.peak = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        srv = self.server
+        calls = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with srv.lock:
+            srv.batches.append(len(calls))
+            srv.in_flight += 1
+            srv.peak = max(srv.peak, srv.in_flight)
+        try:
+            time.sleep(srv.delay)
+            if any(c["params"][0] in srv.failing for c in calls):
+                self.send_response(500)
+                self.end_headers()
+                self.wfile.write(b"upstream error")
+                return
+            body = json.dumps([{"jsonrpc": "2.0", "id": c["id"], "result": {"totalBalance": str(balance_of(c["params"][0]))}}
+                               for c in calls]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with srv.lock: srv.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def rpc():
+    servers = []
+    def start(**kw) -> StubRPC:
+        srv = StubRPC(**kw)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers.append(srv)
+        return srv
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+def test_batches_of_fifty_per_post(live_app, rpc):
+    srv = rpc()
+    addrs = [address(i) for i in range(1, 121)]
+    balances = live_app["get_sui_balances"](addrs, rpc_url=srv.url)
+    assert sorted(srv.batches) == [20, 50, 50]
+    assert live_app["BALANCE_RPC_BATCH"] == 50
+    assert balances == {a: balance_of(a) / MIST for a in addrs}
+
+
+def test_concurrency_is_bounded_by_workers(live_app, rpc):
+    srv = rpc(delay=0.05)
+    live_app["get_sui_balances"]([address(i) for i in range(1, 201)], rpc_url=srv.url, batch_size=10, workers=3)
+    assert len(srv.batches) == 20
+    assert 1 < srv.peak <= 3
+
+
+def test_results_are_cached_until_ttl(live_app, rpc):
+    srv = rpc()
+    cache = live_app["get_balance_cache"]()
+    cache.ttl = 0.2
+    addrs = [address(i) for i in range(1, 11)]
+    first = live_app["get_sui_balances"](addrs, rpc_url=srv.url)
+    assert all(cache.get(a) == first[a] for a in addrs)
+    assert live_app["get_sui_balances"](addrs, rpc_url=srv.url) == first
+    assert len(srv.batches) == 1
+    time.sleep(0.25)
+    live_app["get_sui_balances"](addrs, rpc_url=srv.url)
+    assert len(srv.batches) == 2
+
+
+def test_failed_batches_read_zero_and_are_not_cached(live_app, rpc):
+    bad = address(7)
+    srv = rpc(failing={bad})
+    cache = live_app["get_balance_cache"]()
+    addrs = [address(i) for i in range(1, 21)]
+    balances = live_app["get_sui_balances"](addrs, rpc_url=srv.url, batch_size=10)
+    failed, ok = addrs[:10], addrs[10:]
+    assert all(balances[a] == 0.0 and cache.get(a) is None for a in failed)
+    assert all(balances[a] == balance_of(a) / MIST and cache.get(a) == balances[a] for a in ok)
+    srv.failing.clear()
+    live_app["get_sui_balances"](addrs, rpc_url=srv.url, batch_size=10)
+    assert srv.batches[-1] == 10  # only the failed batch is asked again
+
+
+class FakeSuiClient:
+    """get_gas() for get_sui_balance: two coins per address, or an error result."""
+
+    def __init__(self):
+        self.calls, self.ok = 0, True
+
+    def get_gas(self, address):
+        self.calls += 1
+        coin = type("Coin", (), {"balance": "1500000000"})
+        data = type("Gas", (), {"data": [coin, coin]})
+        return type("Result", (), {"is_ok": lambda _: self.ok, "result_data": data})()
+
+
+def test_single_balance_is_cached_until_ttl(live_app):
+    client = FakeSuiClient()
+    live_app["get_sui_client"] = lambda: client
+    live_app["get_balance_cache"]().ttl = 0.2
+    addr = address(1)
+    assert live_app["get_sui_balance"](addr) == 3.0
+    assert live_app["get_sui_balance"](addr) == 3.0
+    assert client.calls == 1
+    live_app["get_sui_balance"](addr, use_cache=False)
+    assert client.calls == 2
+    time.sleep(0.25)
+    client.ok = False
+    assert live_app["get_sui_balance"](addr) == 0.0
+    assert live_app["get_balance_cache"]().get(addr) is None  # failures aren't cached
@@ -0,0 +1,24 @@
+def test_messages_since_returns_only_newer_ones_both_ways(app, users):
+    for sender, receiver, text in [(1, 2, "hi"), (2, 1, "hey"), (1, 3, "other chat"), (1, 2, "how are you")]:
+        app["send_message"](sender, receiver, text)
+    everything = app["get_messages_since"](1, 2)
+    assert [m["text"] for m in everything] == ["hi", "hey", "how are you"]
+    assert [m["text"] for m in app["get_messages_since"](2, 1, everything[1]["id"])] == ["how are you"]
+    assert app["get_messages_since"](1, 2, everything[-1]["id"]) == []
+
+
+def test_polling_backs_off_while_idle_and_resets_on_new_messages(app, users):
+    state = {"msgs": [], "last_id": 0, "idle": 0, "tier": 0}
+    poll = lambda: app["_chat_fragment"](state, 1, 2)
+    app["send_message"](2, 1, "hi")
+    poll()
+    assert [m["text"] for m in state["msgs"]] == ["hi"] and state["idle"] == 0
+    tiers = []
+    for _ in range(3 * app["CHAT_IDLE_POLLS"]):
+        poll()
+        tiers.append(state["tier"])
+    assert tiers[0] == 0 and tiers[-1] == len(app["CHAT_POLL_INTERVALS"]) - 1
+    assert tiers == sorted(tiers)
+    app["send_message"](2, 1, "still there?")
+    poll()
+    assert state["tier"] == 0 and [m["text"] for m in state["msgs"]] == ["hi", "still there?"]
@@ -0,0 +1,29 @@
+def _counts(app, post, user):
+    return (app["get_likes_for_post"](post), app["get_post"](post)["reply_count"],
+            app["get_follower_count"](user), app["get_following_count"](user))
+
+
+def test_interactions_keep_the_counters_in_step(app, users):
+    post = app["create_post"](1, "hello")
+    for u in (2, 3, 4): app["like_post"](u, post)
+    assert not app["like_post"](2, post)  # a repeated like changes nothing
+    app["unlike_post"](3, post)
+    app["reply_to_post"](2, post, "one")
+    app["reply_to_post"](3, post, "two")
+    for u in (2, 3): app["follow_user"](u, 1)
+    assert not app["follow_user"](2, 1)
+    app["follow_user"](1, 5)
+    app["unfollow_user"](3, 1)
+    assert _counts(app, post, 1) == (2, 2, 1, 1)
+    assert (app["get_follower_count"](5), app["get_following_count"](2)) == (1, 1)
+
+
+def test_recount_repairs_drifted_counters(app, users):
+    post = app["create_post"](1, "hello")
+    app["like_post"](2, post)
+    app["follow_user"](2, 1)
+    app["run_write"](lambda c: c.execute("UPDATE posts SET like_count = 40, reply_count = 7"))
+    app["run_write"](lambda c: c.execute("UPDATE users SET follower_count = 9, following_count = 9"))
+    app["recount_counters"]()
+    assert _counts(app, post, 1) == (1, 0, 1, 0)
+    assert app["get_following_count"](2) == 1
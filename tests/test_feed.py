@@ -0,0 +1,34 @@
+def _feed(app, user, **kw):
+    return [p["id"] for p in app["get_feed"](user, **kw)]
+
+
+def test_follows_fan_out_and_backfill(app, users):
+    old = app["create_post"](2, "before the follow")
+    app["follow_user"](1, 2)
+    new = app["create_post"](2, "after the follow")
+    mine = app["create_post"](1, "my own")
+    app["create_post"](3, "not followed")
+    assert _feed(app, 1) == [mine, new, old]
+    app["unfollow_user"](1, 2)
+    assert _feed(app, 1) == [mine]
+
+
+def test_big_accounts_are_merged_at_read_time(app, users):
+    app["TIMELINE_FANOUT_LIMIT"] = 2
+    for u in (1, 3, 4): app["follow_user"](u, 2)
+    posts = [app["create_post"](2, f"celebrity {i}") for i in range(3)]
+    app["create_post"](5, "unrelated")
+    assert app["get_conn"]().execute("SELECT COUNT(*) FROM timeline WHERE author_id = 2 AND user_id != 2").fetchone()[0] == 0
+    assert _feed(app, 1) == posts[::-1]
+
+
+def test_feed_pages_by_cursor(app, users):
+    app["follow_user"](1, 2)
+    posts = [app["create_post"](2, f"post {i}") for i in range(7)]
+    seen, before = [], None
+    while True:
+        page = app["get_feed"](1, limit=3, before=before)
+        seen += [p["id"] for p in page]
+        before = app["page_cursor"](page, 3)
+        if before is None: break
+    assert seen == posts[::-1]
@@ -0,0 +1,33 @@
+def _queries(app, fn, *args):
+    metrics = app["get_metrics"]()
+    metrics.begin("test")
+    result = fn(*args)
+    return result, metrics.end()["queries"]
+
+
+def test_view_models_carry_counts_flags_and_replies(app, users):
+    a, b = app["create_post"](1, "first"), app["create_post"](2, "second")
+    app["like_post"](3, a)
+    app["like_post"](1, a)
+    app["bookmark_post"](3, b)
+    app["reply_to_post"](2, a, "nice")
+    views = {v["id"]: v for v in app["hydrate_posts"](app["get_recent_posts"](), viewer_id=3)}
+    assert (views[a]["like_count"], views[a]["reply_count"]) == (2, 1)
+    assert views[a]["liked"] and not views[a]["bookmarked"]
+    assert views[b]["bookmarked"] and not views[b]["liked"]
+    assert [r["text"] for r in views[a]["replies"]] == ["nice"] and views[b]["replies"] == []
+
+
+def test_query_count_does_not_grow_with_the_page(app, users):
+    for i in range(30): app["reply_to_post"](2, app["create_post"](1, f"post {i}"), "reply")
+    few, few_queries = _queries(app, app["hydrate_posts"], app["get_recent_posts"](limit=3), 3)
+    many, many_queries = _queries(app, app["hydrate_posts"], app["get_recent_posts"](limit=30), 3)
+    assert len(few) == 3 and len(many) == 30
+    assert many_queries == few_queries == 4  # counts, likes, bookmarks, replies
+
+
+def test_counts_are_reread_for_stale_rows(app, users):
+    post = app["create_post"](1, "hello")
+    rows = [dict(r) for r in app["get_recent_posts"]()]  # e.g. a page kept in session state
+    app["like_post"](2, post)
+    assert app["hydrate_posts"](rows, viewer_id=2)[0]["like_count"] == 1
@@ -0,0 +1,42 @@
+import base64
+import os
+
+
+def _file(tmp_path, name: str, size: int) -> str:
+    path = str(tmp_path / name)
+    with open(path, "wb") as f: f.write(os.urandom(size))
+    return path
+
+
+def test_hits_until_the_file_changes(app, tmp_path):
+    cache = app["ImageCache"](max_bytes=10_000)
+    path = _file(tmp_path, "a.png", 300)
+    first = cache.get(path)
+    assert base64.b64decode(first) == open(path, "rb").read()
+    assert cache.get(path) == first
+    with open(path, "wb") as f: f.write(b"new bytes")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    assert base64.b64decode(cache.get(path)) == b"new bytes"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_evicts_least_recently_used_by_bytes(app, tmp_path):
+    a, b, c = (_file(tmp_path, f"{n}.png", 300) for n in "abc")  # 400 bytes encoded
+    cache = app["ImageCache"](max_bytes=1000)
+    cache.get(a)
+    cache.get(b)
+    cache.get(a)  # b is now the oldest
+    cache.get(c)
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 800, 1)
+    cache.get(a)
+    assert cache.stats()["hits"] == 2
+    cache.get(b)
+    assert cache.stats()["misses"] == 4
+
+
+def test_files_bigger_than_the_cache_are_not_kept(app, tmp_path):
+    cache = app["ImageCache"](max_bytes=100)
+    cache.get(_file(tmp_path, "big.png", 300))
+    assert cache.stats()["entries"] == cache.stats()["bytes"] == 0
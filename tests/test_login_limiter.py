@@ -0,0 +1,27 @@
+import time
+
+
+def test_locks_out_after_max_failures(app):
+    limiter = app["LoginLimiter"](max_failures=3, window=60)
+    for _ in range(2): limiter.failed("alice")
+    assert limiter.retry_after("alice") == 0.0
+    limiter.failed("alice")
+    assert 59 < limiter.retry_after("alice") <= 60
+    limiter.succeeded("alice")
+    assert limiter.retry_after("alice") == 0.0
+
+
+def test_expired_usernames_are_pruned_on_failure(app):
+    limiter = app["LoginLimiter"](max_failures=3, window=0.05)
+    for i in range(100): limiter.failed(f"user{i}")
+    time.sleep(0.06)
+    limiter.failed("bob")
+    assert list(limiter._failures) == ["bob"]
+
+
+def test_tracked_usernames_are_capped(app):
+    limiter = app["LoginLimiter"](max_failures=3, window=60, max_users=50)
+    for _ in range(5): limiter.failed("target")
+    for i in range(1000): limiter.failed(f"spray{i}")
+    assert len(limiter._failures) == 50
+    assert all(len(q) <= 3 for q in limiter._failures.values())
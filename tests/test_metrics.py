@@ -0,0 +1,31 @@
+def test_reruns_count_queries_calls_and_repeats(app, users):
+    metrics = app["get_metrics"]()
+    metrics.begin("profile")
+    app["get_posts_for_user"](1)
+    for i in range(1, 6):
+        for _ in range(app["N_PLUS_ONE_THRESHOLD"] // 5): app["get_following_count"](i)
+    record = metrics.end()
+    assert record["view"] == "profile" and not record["interrupted"]
+    assert record["queries"] == 1 + app["N_PLUS_ONE_THRESHOLD"]
+    assert record["calls"] == {"get_posts_for_user": 1}  # only @timed functions count as calls
+    assert list(record["repeated"]) == ["SELECT following_count FROM users WHERE id = ?"]
+    snap = app["metrics_snapshot"]()
+    assert snap["views"]["profile"]["reruns"] == 1
+    assert snap["functions"]["get_posts_for_user"]["calls"] == 1
+
+
+def test_a_new_rerun_closes_an_interrupted_one(app):
+    metrics = app["get_metrics"]()
+    metrics.begin("home")
+    metrics.begin("messages")  # st.rerun() skipped the end of the "home" run
+    metrics.end()
+    views = metrics.snapshot()["views"]
+    assert views["home"]["last"]["interrupted"] and not views["messages"]["last"]["interrupted"]
+
+
+def test_slow_queries_are_logged_with_their_plan(app, users):
+    app["SLOW_QUERY_MS"] = 0
+    app["get_recent_posts"]()
+    slow = app["get_metrics"]().snapshot()["slow_queries"]
+    entry = next(e for e in slow if e["sql"].startswith("SELECT p.*"))
+    assert entry["plan"] and any("posts" in step for step in entry["plan"])
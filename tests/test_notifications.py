@@ -0,0 +1,56 @@
+import itertools
+import threading
+
+import pytest
+
+_clock = itertools.count(1)
+
+
+@pytest.fixture
+def queue(app):
+    app["run_write"](lambda c: c.executemany(
+        "INSERT INTO users (username, display_name, password_hash, created_at) VALUES (?, ?, 'x', 0)",
+        [(f"u{i}", f"U{i}") for i in range(1, 6)]))
+    q = app["get_notification_queue"]()
+    q.stop()  # flush by hand instead of racing the worker
+    return q
+
+
+def _events(kind, target, *actors):
+    return [(1, kind, target, a, float(next(_clock))) for a in actors]
+
+
+def _texts(app):
+    return [app["notification_text"](n) for n in app["get_notifications"](1)]
+
+
+def test_coalescing_counts_distinct_actors(app, queue):
+    queue.flush(_events("like", 9, 2, 3, 2, 2))
+    assert _texts(app) == ["@u2 and 1 other liked your post"]
+    queue.flush(_events("like", 9, 3, 2))  # repeats across batches don't count either
+    assert _texts(app) == ["@u2 and 1 other liked your post"]
+    queue.flush(_events("like", 9, 4, 5))
+    assert _texts(app) == ["@u5 and 3 others liked your post"]
+    assert app["get_unread_count"](1) == 1
+
+
+def test_seen_rows_start_a_fresh_count(app, queue):
+    queue.flush(_events("follow", 0, 2, 3))
+    app["mark_notifications_seen"](1)
+    queue.flush(_events("follow", 0, 2))
+    assert _texts(app) == ["@u2 followed you", "@u3 and 1 other followed you"]
+
+
+def test_messages_count_events(app, queue):
+    queue.flush(_events("message", 2, 2, 2, 2))
+    assert _texts(app) == ["3 new messages from @u2"]
+
+
+def test_stats_count_every_event_across_threads(app, queue):
+    threads = [threading.Thread(target=lambda i=i: [queue.put(1, "like", 2 + i % 4, n) for n in range(500)]) for i in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert queue.stats()["enqueued"] == 4000
+    while queue.stats()["pending"]: queue.flush()
+    stats = queue.stats()
+    assert stats["written"] == 4000 and stats["failed"] == 0
@@ -0,0 +1,32 @@
+def _all_pages(app, fetch, limit, *keys):
+    seen, before = [], None
+    while True:
+        page = fetch(before)
+        seen.append([dict(r) for r in page])
+        before = app["page_cursor"](page, limit, *keys)
+        if before is None: return seen
+
+
+def test_pages_split_timestamp_ties_by_id(app, users):
+    posts = [app["create_post"](1 + i % 2, f"post {i}") for i in range(10)]
+    app["run_write"](lambda c: c.execute("UPDATE posts SET created_at = 1000.0"))
+    pages = _all_pages(app, lambda before: app["get_recent_posts"](limit=4, before=before), 4)
+    assert [len(p) for p in pages] == [4, 4, 2]
+    assert [r["id"] for p in pages for r in p] == posts[::-1]
+    mine = _all_pages(app, lambda before: app["get_posts_for_user"](1, limit=2, before=before), 2)
+    assert [r["id"] for p in mine for r in p] == posts[::2][::-1]
+
+
+def test_liked_posts_page_by_like_time(app, users):
+    posts = [app["create_post"](2, f"post {i}") for i in range(5)]
+    for post in (posts[3], posts[0], posts[4], posts[1]): app["like_post"](1, post)
+    pages = _all_pages(app, lambda before: app["get_liked_posts_for_user"](1, limit=3, before=before), 3, "liked_at")
+    assert [r["id"] for p in pages for r in p] == [posts[1], posts[4], posts[0], posts[3]]
+
+
+def test_replies_page_by_reply_cursor(app, users):
+    post = app["create_post"](2, "post")
+    for i in range(5): app["reply_to_post"](1, post, f"reply {i}")
+    pages = _all_pages(app, lambda before: app["get_replies_for_user"](1, limit=2, before=before), 2,
+                       "reply_created_at", "reply_id")
+    assert [r["reply_text"] for p in pages for r in p] == [f"reply {i}" for i in range(4, -1, -1)]
@@ -0,0 +1,90 @@
+"""PriceFeed against a local stub of the 24hr ticker endpoint."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class StubTicker(ThreadingHTTPServer):
+    """Serves a 24hr ticker; `status` and `delay` simulate an unhealthy upstream."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.price, self.change = "3.25", "-1.5"
+        self.status, self.delay = 200, 0.0
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/ticker"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        srv = self.server
+        srv.requests += 1
+        time.sleep(srv.delay)
+        body = json.dumps({"symbol": "SUIUSDT", "lastPrice": srv.price, "priceChangePercent": srv.change}).encode()
+        self.send_response(srv.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ticker():
+    srv = StubTicker()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_fetches_the_ticker(app, ticker):
+    feed = app["PriceFeed"](url=ticker.url)
+    assert feed.refresh()
+    price, change, age = feed.latest()
+    assert (price, change) == (3.25, -1.5)
+    assert 0 <= age < 1
+
+
+def test_falls_back_until_a_fetch_succeeds(app, ticker):
+    feed = app["PriceFeed"](url=ticker.url, timeout=0.2)
+    ticker.status = 502
+    assert not feed.refresh()
+    assert feed.latest() == (*app["FALLBACK_PRICE"], None)
+    ticker.status, ticker.delay = 200, 0.5
+    assert not feed.refresh()
+    assert feed.latest() == (*app["FALLBACK_PRICE"], None)
+
+
+def test_errors_keep_the_last_known_price(app, ticker):
+    feed = app["PriceFeed"](url=ticker.url, timeout=0.2)
+    assert feed.refresh()
+    ticker.price, ticker.status = "9.99", 503
+    assert not feed.refresh()
+    ticker.status, ticker.delay = 200, 0.5
+    assert not feed.refresh()
+    assert feed.latest()[:2] == (3.25, -1.5)
+
+
+def test_readers_reuse_the_quote_until_the_next_refresh(app, ticker):
+    feed = app["PriceFeed"](url=ticker.url, interval=0.3).start()
+    try:
+        deadline = time.time() + 2
+        while feed.latest()[2] is None and time.time() < deadline: time.sleep(0.01)
+        for _ in range(100): feed.latest()
+        assert ticker.requests == 1
+        ticker.price = "4.00"
+        time.sleep(0.45)
+        assert ticker.requests == 2
+        assert feed.latest()[0] == 4.0
+    finally:
+        feed.stop()
@@ -0,0 +1,22 @@
+def test_header_has_counts_follow_state_and_mutuals(app, users):
+    for follower in (2, 3, 4): app["follow_user"](follower, 5)
+    app["follow_user"](1, 2)
+    app["follow_user"](1, 3)
+    app["create_post"](5, "hello")
+    p = app["get_profile"]("u5", 1)
+    assert (p["follower_count"], p["following_count"], p["post_count"]) == (3, 0, 1)
+    assert not p["is_following"]
+    assert sorted(m["username"] for m in p["mutuals"]) == ["u2", "u3"]
+    assert app["get_profile"]("u5", 5)["mutuals"] == []
+    assert app["get_profile"]("nobody", 1) is None
+
+
+def test_headers_are_cached_until_a_follow_or_post(app, users):
+    assert app["get_profile"]("u2", 1)["follower_count"] == 0
+    app["run_write"](lambda c: c.execute("UPDATE users SET bio = 'changed behind the cache' WHERE id = 2"))
+    assert app["get_profile"]("u2", 1)["bio"] is None  # served from cache
+    app["follow_user"](1, 2)
+    p = app["get_profile"]("u2", 1)
+    assert (p["follower_count"], p["is_following"]) == (1, True)
+    app["create_post"](2, "new post")
+    assert app["get_profile"]("u2", 1)["post_count"] == 1
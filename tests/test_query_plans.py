@@ -0,0 +1,11 @@
+def test_hot_queries_use_indexes(seeded_app):
+    seeded_app["init_db"]()
+    assert seeded_app["check_query_plans"]() == {}
+
+
+def test_plans_cover_the_paged_readers(seeded_app):
+    expected = {"get_feed", "get_posts_for_user", "get_recent_posts", "get_liked_posts_for_user",
+                "get_bookmarks_for_user", "get_replies_for_user", "get_posts_for_tag",
+                "search_posts", "search_users", "get_notifications"}
+    assert expected <= set(seeded_app["HOT_QUERY_PLANS"])
+
@@ -0,0 +1,6 @@
+def test_schema_setup_runs_once_per_process(app):
+    assert app["ensure_schema"]() == app["MIGRATIONS"][-1][0]
+    statements = []
+    app["get_conn"]().set_trace_callback(statements.append)
+    app["ensure_schema"]()
+    assert statements == []
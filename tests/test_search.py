@@ -0,0 +1,26 @@
+def test_search_users_returns_public_columns_only(seeded_app):
+    users = seeded_app["search_users"]("user1")
+    assert users
+    assert set(users[0].keys()) == set(seeded_app["USER_COLUMNS"].split(", "))
+
+
+def test_search_posts_highlight_matches(seeded_app):
+    posts = seeded_app["search_posts"]("sui", limit=20)
+    assert len(posts) == 20
+    assert all("<mark>" in p["snippet"] for p in posts)
+
+
+def test_search_posts_trades_relevance_for_recency(app):
+    app["run_write"](lambda c: c.execute(
+        "INSERT INTO users (username, display_name, password_hash, created_at) VALUES ('u1', 'U1', 'x', 0)"))
+    old = app["create_post"](1, "sui sui sui sui")
+    new = app["create_post"](1, "sui is up today, more later")
+    now = app["now_ts"]()
+    app["run_write"](lambda c: c.execute("UPDATE posts SET created_at = ? WHERE id = ?", (now - 60 * 86400, old)))
+    by_bm25 = [r[0] for r in app["get_conn"]().execute(
+        "SELECT rowid FROM posts_fts WHERE posts_fts MATCH 'sui' ORDER BY rank")]
+    assert by_bm25 == [old, new]
+    assert [p["id"] for p in app["search_posts"]("sui")] == [new, old]
+    # only the best SEARCH_CANDIDATES matches are re-ranked
+    app["SEARCH_CANDIDATES"] = 1
+    assert [p["id"] for p in app["search_posts"]("sui")] == [old]
@@ -0,0 +1,53 @@
+class FakeCookieManager:
+    """Records writes; the browser's reported cookies only change when a test says so."""
+
+    def __init__(self):
+        self.writes = []
+
+    def set(self, cookie, val, expires_at=None, key="set"):
+        self.writes.append(("set", cookie, val))
+
+    def delete(self, cookie, key="delete"):
+        self.writes.append(("delete", cookie))
+
+
+def _rerun(app, manager, cookies, state, times):
+    return [app["sync_session_cookie"](manager, cookies, state) for _ in range(times)]
+
+
+def test_login_then_logout_with_a_stale_cookie_read(app):
+    cookie, attempts = app["SESSION_COOKIE"], app["COOKIE_WRITE_ATTEMPTS"]
+    manager, state = FakeCookieManager(), {}
+
+    # login: the browser never reports the new cookie, so the write is retried a few times only
+    state["pending_cookie"] = ("set", "tok", 0)
+    assert _rerun(app, manager, {}, state, 10) == [None] * 10
+    assert manager.writes == [("set", cookie, "tok")] * attempts
+    assert state["pending_cookie"] is None
+
+    # logout: same for the delete, and the revoked token is not handed back for resolving
+    manager.writes.clear()
+    state.update(revoked_token="tok", pending_cookie=("delete", "tok", 0))
+    assert _rerun(app, manager, {cookie: "tok"}, state, 10) == [None] * 10
+    assert manager.writes == [("delete", cookie)] * attempts
+    assert state["pending_cookie"] is None
+
+
+def test_acknowledged_writes_stop_immediately(app):
+    cookie = app["SESSION_COOKIE"]
+    manager, state = FakeCookieManager(), {"pending_cookie": ("set", "tok", 0)}
+    app["sync_session_cookie"](manager, {}, state)
+    assert app["sync_session_cookie"](manager, {cookie: "tok"}, state) == "tok"
+    assert state["pending_cookie"] is None
+    assert len(manager.writes) == 1
+
+    state["pending_cookie"] = ("delete", "tok", 0)
+    assert app["sync_session_cookie"](manager, {}, state) is None
+    assert state["pending_cookie"] is None
+    assert len(manager.writes) == 1
+
+
+def test_cookie_token_is_returned_when_nothing_is_pending(app):
+    cookie = app["SESSION_COOKIE"]
+    assert app["sync_session_cookie"](FakeCookieManager(), {cookie: "tok"}, {}) == "tok"
+    assert app["sync_session_cookie"](FakeCookieManager(), {}, {}) is None
@@ -0,0 +1,30 @@
+def test_extracts_tags_and_mentions(app):
+    tags, names = app["extract_terms"]("#Sui to the moon @alice, mail@example.com #sui #move_2")
+    assert tags == {"sui", "move_2"} and names == {"alice"}
+    assert app["extract_terms"](None) == (set(), set())
+
+
+def test_tag_pages_and_mentions_are_indexed(app, users):
+    a = app["create_post"](1, "gm #SUI")
+    app["create_post"](2, "no tags")
+    b = app["create_post"](3, "#sui again, cc @u2 @u3")
+    app["reply_to_post"](4, a, "#sui in a reply")
+    assert [p["id"] for p in app["get_posts_for_tag"]("#Sui")] == [b, a]  # replies don't list
+    mentions = app["get_conn"]().execute("SELECT user_id, post_id FROM mentions").fetchall()
+    assert [tuple(m) for m in mentions] == [(2, b)]  # authors don't mention themselves
+    app["get_notification_queue"]().stop()  # writes whatever the worker holds
+    assert [n["kind"] for n in app["get_notifications"](2)] == ["mention"]
+
+
+def test_trending_decays_older_uses(app, users):
+    half_life, clock = app["TREND_HALF_LIFE"], [1_000_000.0]
+    app["now_ts"] = lambda: clock[0]
+    for _ in range(3): app["create_post"](1, "#old")
+    clock[0] += 2 * half_life  # each #old use now counts 1/4
+    app["create_post"](2, "#new")
+    app["create_post"](2, "#new")
+    trending = app["get_trending"]()
+    assert [t["tag"] for t in trending] == ["new", "old"]
+    assert abs(trending[0]["score"] - 2) < 1e-6 and abs(trending[1]["score"] - 0.75) < 1e-6
+    clock[0] += app["TREND_WINDOW"] + 1
+    assert app["get_trending"]() == []
@@ -0,0 +1,60 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+
+@pytest.fixture
+def media(app, tmp_path):
+    app["MEDIA_DIR"] = str(tmp_path / "media")
+    os.makedirs(app["MEDIA_DIR"])
+    return app["MEDIA_DIR"]
+
+
+def _animation(fmt: str, size=(64, 48), frames=3, **save) -> io.BytesIO:
+    imgs = [Image.new("RGB", size, (80 * i, 40, 200)) for i in range(frames)]
+    buf = io.BytesIO()
+    imgs[0].save(buf, fmt, save_all=True, append_images=imgs[1:], duration=120, loop=0, **save)
+    buf.seek(0)
+    return buf
+
+
+@pytest.mark.parametrize("fmt, ext", [("GIF", ".gif"), ("WEBP", ".webp"), ("PNG", ".png")])
+def test_animations_keep_their_format(app, media, fmt, ext):
+    path = app["save_upload"](_animation(fmt), app["POST_IMAGE_DIR"])
+    digest = app["image_digest"](path)
+    feed = app["_variant_file"](digest, "feed")
+    assert path.endswith(ext) and feed.endswith(ext)
+    for f in (path, feed):
+        with Image.open(f) as img:
+            assert img.format == fmt and img.is_animated and img.n_frames == 3
+
+
+def test_animations_are_capped_and_stripped(app, media):
+    exif = Image.Exif()
+    exif[0x010F] = "camera"
+    upload = _animation("WEBP", size=(3000, 200), exif=exif.tobytes())
+    path = app["save_upload"](upload, app["POST_IMAGE_DIR"])
+    with Image.open(path) as img:
+        assert max(img.size) == app["UPLOAD_MAX_DIMENSION"]
+        assert not img.info.get("exif")
+    with Image.open(app["_variant_file"](app["image_digest"](path), "feed")) as img:
+        assert max(img.size) == app["IMAGE_VARIANTS"]["feed"]
+
+
+def test_oversized_animations_are_rejected(app, media):
+    app["UPLOAD_MAX_ANIMATION_PIXELS"] = 64 * 48 * 2
+    with pytest.raises(app["UploadError"]):
+        app["save_upload"](_animation("GIF"), app["POST_IMAGE_DIR"])
+
+
+def test_truncated_jpegs_are_rejected(app, media):
+    noise = Image.frombytes("RGB", (256, 256), os.urandom(256 * 256 * 3))
+    buf = io.BytesIO()
+    noise.save(buf, "JPEG", quality=95)
+    assert buf.tell() > 3000
+    dest = app["POST_IMAGE_DIR"]
+    with pytest.raises(app["UploadError"]):
+        app["save_upload"](io.BytesIO(buf.getvalue()[:3000]), dest)
+    assert not [f for f in os.listdir(dest) if not f.startswith(".")]
@@ -0,0 +1,28 @@
+def _queries(app, fn, *args):
+    metrics = app["get_metrics"]()
+    metrics.begin("test")
+    result = fn(*args)
+    return result, metrics.end()["queries"]
+
+
+def test_rows_are_cached_by_id_and_username(app, users):
+    user, queries = _queries(app, app["get_user_by_id"], 2)
+    assert user["username"] == "u2" and queries == 1
+    assert _queries(app, app["get_user_by_id"], 2) == (user, 0)
+    assert _queries(app, app["get_user_by_username"], "u2") == (user, 0)
+    assert "private_key" not in user and "password_hash" not in user
+
+
+def test_edits_invalidate_both_keys(app, users):
+    app["get_user_by_id"](2)
+    app["update_user_details"](2, "Renamed", "new bio")
+    assert app["get_user_by_id"](2)["display_name"] == "Renamed"
+    assert app["get_user_by_username"]("u2")["bio"] == "new bio"
+
+
+def test_callers_get_copies_and_misses_are_not_cached(app, users):
+    app["get_user_by_id"](3)["display_name"] = "mutated"
+    assert app["get_user_by_id"](3)["display_name"] == "U3"
+    assert app["get_user_by_username"]("newcomer") is None
+    user_id = app["create_user"]("newcomer", "New", "pw")
+    assert app["get_user_by_username"]("newcomer")["id"] == user_id
@@ -0,0 +1,34 @@
+import itertools
+import threading
+import time
+
+
+def _wallets():
+    n = itertools.count()
+    return lambda: (f"0x{next(n):064x}", "key", "mnemonic")
+
+
+def test_claims_are_prefilled_then_fall_back_to_inline(app):
+    pool = app["WalletPool"](size=4, workers=1, generate=_wallets())
+    try:
+        deadline = time.time() + 2
+        while pool.stats()["depth"] < 4 and time.time() < deadline: time.sleep(0.01)
+        pool.stop()
+        time.sleep(0.6)  # let the filler notice the stop
+        claimed = [pool.claim() for _ in range(6)]
+        assert len({w[0] for w in claimed}) == 6
+        stats = pool.stats()
+        assert stats["claimed"] == 6 and stats["fallbacks"] >= 2
+    finally:
+        pool.stop()
+
+
+def test_concurrent_counts_are_exact(app):
+    pool = app["WalletPool"](size=1, workers=2, generate=_wallets())
+    try:
+        threads = [threading.Thread(target=lambda: [pool.claim() for _ in range(500)]) for _ in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        assert pool.stats()["claimed"] == 4000
+    finally:
+        pool.stop()
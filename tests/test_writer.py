@@ -0,0 +1,43 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def writer(app, tmp_path):
+    path = str(tmp_path / "writes.db")
+    sqlite3.connect(path).execute("CREATE TABLE t (k INTEGER PRIMARY KEY, v TEXT)").connection.commit()
+    w = app["WriteCoordinator"](path, window=0.1)
+    yield w, path
+    w.stop()
+
+
+def _insert(k, v="x"):
+    return lambda c: c.execute("INSERT INTO t (k, v) VALUES (?, ?)", (k, v)).lastrowid
+
+
+def test_a_failing_job_is_rolled_back_alone(writer):
+    w, path = writer
+    futures = [w.submit(_insert(1)), w.submit(_insert(1, "dup")), w.submit(_insert(2))]
+    assert futures[0].result() == 1 and futures[2].result() == 2
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[1].result()
+    assert sqlite3.connect(path).execute("SELECT k, v FROM t ORDER BY k").fetchall() == [(1, "x"), (2, "x")]
+    stats = w.stats()
+    assert (stats["jobs"], stats["batches"], stats["failed"]) == (3, 1, 1)
+
+
+def test_results_wait_for_the_commit(writer):
+    w, path = writer
+    for k in range(20):
+        w.submit(_insert(k))
+    w.submit(_insert(100)).result()
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM t").fetchone()[0] == 21
+    assert w.stats()["batches"] < 21
+
+
+def test_nested_run_write_joins_the_outer_job(app, users):
+    def outer(c):
+        c.execute("UPDATE users SET bio = 'outer' WHERE id = 1")
+        return app["run_write"](lambda inner: inner.execute("SELECT bio FROM users WHERE id = 1").fetchone()[0])
+    assert app["run_write"](outer) == "outer"